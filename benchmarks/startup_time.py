@@ -0,0 +1,113 @@
+# Benchmark of the startup time of an extractor (cold start of the Cloud Run container)
+#
+# Measures the time from the start of a new python process to the first API call of the same extractor,
+# run from the old layout (its folder and data_governance modules before the package, taken from git) and
+# from the package command line. Both include the interpreter startup and every import done before the first call.
+#
+# The credentials are replaced by a fake token and the process exits at the first DNS lookup of the
+# first API call, so no network or google account is needed.
+#
+#   python benchmarks/startup_time.py [--extractor views] [--runs 10]
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+#main.py of each extractor in the old layout
+OLD_SCRIPTS = {'tables': 'Get_data_bigquery/bigquery_tables_analysis/main.py',
+               'views': 'Get_data_bigquery/bigquery_views_analysis/main.py',
+               'dataplex': 'Get_data_dataplex/dataplex_assets_analysis/main.py'}
+
+#Fake impersonated credentials and exit at the first DNS lookup, printing the time of the first API call
+PRELUDE = """
+import os, socket, sys, time, types
+def first_api_call(*args, **kwargs):
+    print(time.time(), flush=True)
+    os._exit(0)
+socket.getaddrinfo = first_api_call
+iam_credentials = types.ModuleType('google.cloud.iam_credentials')
+iam_credentials.GenerateAccessTokenRequest = lambda **kwargs: kwargs
+iam_credentials.IAMCredentialsClient = lambda: types.SimpleNamespace(
+    generate_access_token=lambda request: types.SimpleNamespace(access_token='token'))
+sys.modules['google.cloud.iam_credentials'] = iam_credentials
+"""
+
+def old_layout(extractor):
+    """
+    Write the folder of the extractor and the data_governance package it imports, from the last commit
+    of the old layout, in a temporary directory.
+
+    Args:
+        extractor (str): tables, views or dataplex
+
+    Returns:
+        main_py (str): path of the main.py
+        root (str): root of the old layout, to put in the PYTHONPATH
+
+    """
+    path = OLD_SCRIPTS[extractor]
+    removed_in = subprocess.run(['git', 'log', '--diff-filter=D', '-1', '--format=%H', '--', path],
+                                cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    root = tempfile.mkdtemp()
+    archive = subprocess.run(['git', 'archive', f"{removed_in}^", os.path.dirname(path), 'data_governance'],
+                             cwd=ROOT, capture_output=True, check=True).stdout
+    subprocess.run(['tar', '-x', '-C', root], input=archive, check=True)
+    return os.path.join(root, path), root
+
+def measure(code, runs, cwd, pythonpath):
+    """
+    Measure the time from the start of a new python process to its first API call.
+
+    Args:
+        code (str): python code to run after the prelude
+        runs (int): number of runs
+        cwd (str): working directory of the process
+        pythonpath (str): PYTHONPATH of the process
+
+    Returns:
+        seconds (list): time to the first API call of each run, empty if the process ended without an API call
+
+    """
+    env = {key: value for key, value in os.environ.items() if key not in ('TIME_BUDGET_SECONDS', 'PUBSUB_EMULATOR_HOST')}
+    env['PYTHONPATH'] = pythonpath
+    seconds = []
+    for _ in range(runs):
+        start = time.time()
+        result = subprocess.run([sys.executable, '-c', PRELUDE + code], cwd=cwd, env=env, capture_output=True, text=True)
+        if result.returncode != 0 or result.stdout.strip() == '':
+            print(result.stderr[-2000:], file=sys.stderr)
+            return []
+        seconds.append(float(result.stdout.strip().splitlines()[-1]) - start)
+    return seconds
+
+def main():
+    parser = argparse.ArgumentParser(description='Time to the first API call of an extractor, old layout vs package.')
+    parser.add_argument('--extractor', choices=sorted(OLD_SCRIPTS), default='views', help='extractor to measure')
+    parser.add_argument('--runs', type=int, default=10, help='runs of each case')
+    args = parser.parse_args()
+
+    main_py, old_root = old_layout(args.extractor)
+    cli_args = [args.extractor, '--service-account', 'projects/-/serviceAccounts/benchmark',
+                '--project-gcp', 'project', '--dataset', 'dataset', '--dataplex-project', 'project']
+    cases = [('python interpreter only', 'print(time.time())', ROOT, ROOT),
+             (f"old layout ({OLD_SCRIPTS[args.extractor]})",
+              f"import runpy; runpy.run_path({main_py!r}, run_name='__main__')", os.path.dirname(main_py), old_root),
+             (f"package (python -m data_governance {args.extractor})",
+              f"import runpy; sys.argv = ['data_governance'] + {cli_args!r}; runpy.run_module('data_governance', run_name='__main__')", ROOT, ROOT)]
+
+    print(f"{'time to the first API call':<70} {'median':>10} {'min':>10}")
+    for name, code, cwd, pythonpath in cases:
+        seconds = measure(code, args.runs, cwd, pythonpath)
+        if seconds == []:
+            print(f"{name:<70} {'failed (missing dependency?)':>21}")
+            continue
+        print(f"{name:<70} {statistics.median(seconds) * 1000:>8.0f}ms {min(seconds) * 1000:>8.0f}ms")
+
+if __name__ == '__main__':
+    main()
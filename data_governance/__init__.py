@@ -0,0 +1,8 @@
+"""
+Data Governance extractors of BigQuery and Dataplex.
+
+Each extractor writes a daily snapshot to BigQuery, they are run by the command line interface
+(python -m data_governance) that shares credentials, api clients and project discovery between them.
+"""
+
+__version__ = '1.0.0'
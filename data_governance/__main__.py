@@ -0,0 +1,3 @@
+from data_governance.cli import main
+
+main()
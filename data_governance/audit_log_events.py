@@ -0,0 +1,456 @@
+# Event-driven updates of the last snapshots from the admin activity audit logs of BigQuery and Dataplex
+import json
+import re
+import time
+from datetime import datetime
+
+import pandas as pd
+
+from data_governance.context import load_table_schema
+from data_governance.deadline import deadline_reached
+from data_governance.transport import build_service
+
+
+#Resource names of the audit log events, partition decorators ($) and snapshot decorators (@) are ignored
+TABLE_RESOURCE_PATTERN = re.compile(r'^projects/([^/]+)/datasets/([^/]+)/tables/([^/$@]+)')
+ASSET_RESOURCE_PATTERN = re.compile(r'^projects/[^/]+/locations/[^/]+/lakes/[^/]+/zones/[^/]+/assets/[^/]+')
+DATASET_RESOURCE_PATTERN = re.compile(r'^projects/([^/]+)/datasets/([^/]+)$')
+ZONE_RESOURCE_PATTERN = re.compile(r'^projects/[^/]+/locations/[^/]+/lakes/[^/]+/zones/[^/]+$')
+
+def parse_audit_log_event(log_entry):
+    """
+    Get the table, deleted dataset or asset touched by an admin activity audit log event of BigQuery or Dataplex.
+
+    Any event on a table is kept, whatever its method (ex: InsertJob of DDL, CTAS and load jobs that create tables),
+    since refresh_events fetches the table again to decide if it is upserted or deleted.
+
+    Args:
+        log_entry (dict): LogEntry exported by the logging sink to Pub/Sub
+
+    Returns:
+        event (tuple): (kind, action, resource) where kind is TABLE, DATASET or ASSET, action is create, update or delete
+            and resource is (project, dataset, table) for tables, (project, dataset) for datasets or the asset name for assets,
+            None if the event does not touch a table, does not delete a dataset and does not touch an asset
+
+    """
+    payload = log_entry.get('protoPayload')
+    if not isinstance(payload, dict):
+        return None
+    method = payload.get('methodName', '').lower()
+    resource_name = payload.get('resourceName', '')
+
+    if 'delete' in method:
+        action = 'delete'
+    elif 'insert' in method or 'create' in method:
+        action = 'create'
+    else:
+        action = 'update'
+
+    if payload.get('serviceName') == 'bigquery.googleapis.com':
+        match = TABLE_RESOURCE_PATTERN.match(resource_name)
+        if match is not None:
+            return ('TABLE', action, match.groups())
+        #DeleteDataset removes all its tables without one event by table
+        match = DATASET_RESOURCE_PATTERN.match(resource_name)
+        if match is not None and action == 'delete':
+            return ('DATASET', action, match.groups())
+        return None
+
+    if payload.get('serviceName') == 'dataplex.googleapis.com' and 'asset' in method:
+        #CreateAsset is logged on the zone, with the asset id in the request
+        asset_id = payload.get('request', {}).get('assetId')
+        if ZONE_RESOURCE_PATTERN.match(resource_name) and asset_id:
+            resource_name = f"{resource_name}/assets/{asset_id}"
+        match = ASSET_RESOURCE_PATTERN.match(resource_name)
+        if match is None:
+            return None
+        return ('ASSET', action, match.group(0))
+
+    return None
+
+def to_datetime_ms(value):
+    """Convert epoch millis (str) of BigQuery api to datetime, None if value is None."""
+    return None if value is None else pd.to_datetime(int(value), unit='ms')
+
+def to_datetime_rfc3339(value):
+    """Convert RFC3339 timestamp of Dataplex api to datetime without timezone (UTC), None if value is None."""
+    return None if value is None else pd.Timestamp(value).tz_convert(None)
+
+def table_row(resp):
+    """
+    Build a row of bigquery_tables_analysis from a tables().get response.
+
+    Args:
+        resp (dict): table resource
+
+    Returns:
+        row (dict): row with the columns of bigquery_tables_analysis (without date_extraction and log_time)
+
+    """
+    reference = resp['tableReference']
+    time_partitioning = resp.get('timePartitioning', {})
+    clustering = resp.get('clustering')
+    row = {'project_id': reference['projectId'],
+           'dataset_id': reference['datasetId'],
+           'table_id': reference['tableId'],
+           'location': resp.get('location'),
+           'timepartition_type': time_partitioning.get('type'),
+           'timepartition_field': time_partitioning.get('field'),
+           'clustering_fields': str(clustering['fields']) if clustering else None,
+           'creation_time': to_datetime_ms(resp.get('creationTime')),
+           'last_modified_time': to_datetime_ms(resp.get('lastModifiedTime')),
+           'description': resp.get('description'),
+           'require_partition_filter': bool(resp.get('requirePartitionFilter', False)),
+           'size_stale': False}
+
+    size_columns = {'num_rows': 'numRows', 'num_bytes': 'numBytes', 'num_partitions': 'numPartitions',
+                    'num_time_travel_physical_bytes': 'numTimeTravelPhysicalBytes',
+                    'num_total_logical_bytes': 'numTotalLogicalBytes', 'num_active_logical_bytes': 'numActiveLogicalBytes',
+                    'num_long_term_logical_bytes': 'numLongTermLogicalBytes', 'num_total_physical_bytes': 'numTotalPhysicalBytes',
+                    'num_active_physical_bytes': 'numActivePhysicalBytes', 'num_long_term_physical_bytes': 'numLongTermPhysicalBytes'}
+    for column, field in size_columns.items():
+        row[column] = int(resp.get(field, 0))
+
+    return row
+
+def view_row(resp):
+    """
+    Build a row of bigquery_views_analysis from a tables().get response of a view.
+
+    Args:
+        resp (dict): view resource
+
+    Returns:
+        row (dict): row with the columns of bigquery_views_analysis (without date_extraction and log_time)
+
+    """
+    reference = resp['tableReference']
+
+    #Remove all \r or \n, same as bigquery_views_analysis
+    def clean(value):
+        return None if value is None else str(value).replace('\n', '').replace('\r', '')
+
+    return {'project_id': reference['projectId'],
+            'dataset_id': reference['datasetId'],
+            'view_id': reference['tableId'],
+            'creation_time': to_datetime_ms(resp.get('creationTime')),
+            'last_modified_time': to_datetime_ms(resp.get('lastModifiedTime')),
+            'location': resp.get('location'),
+            'description': clean(resp.get('description')),
+            'schema_fields': '"' + clean(resp.get('schema', {}).get('fields', [])) + '"',
+            'query': clean(resp.get('view', {}).get('query'))}
+
+def asset_row(resp):
+    """
+    Build a row of dataplex_assets_analysis from an assets().get response.
+
+    Args:
+        resp (dict): asset resource
+
+    Returns:
+        row (dict): row with the columns of dataplex_assets_analysis (without date_extraction and log_time)
+
+    """
+    asset_name = resp['name'].split('/')
+    resource_spec = resp.get('resourceSpec', {})
+    resource_status = resp.get('resourceStatus', {})
+    security_status = resp.get('securityStatus', {})
+    discovery_spec = resp.get('discoverySpec', {})
+    discovery_status = resp.get('discoveryStatus', {})
+    discovery_stats = discovery_status.get('stats', {})
+    last_run_duration = discovery_status.get('lastRunDuration')
+
+    return {'project_asset': asset_name[1],
+            'location_asset': asset_name[3],
+            'lake_asset': asset_name[5],
+            'zone_asset': asset_name[7],
+            'name_asset': asset_name[9],
+            'create_time_asset': to_datetime_rfc3339(resp.get('createTime')),
+            'update_time_asset': to_datetime_rfc3339(resp.get('updateTime')),
+            'state_asset': resp.get('state'),
+            'project_resource_spec': resource_spec['name'].split('/')[1] if 'name' in resource_spec else None,
+            'name_resource_spec': resource_spec['name'].split('/')[-1] if 'name' in resource_spec else None,
+            'type_resource_spec': resource_spec.get('type'),
+            'state_resource_status': resource_status.get('state'),
+            'update_time_resource_status': to_datetime_rfc3339(resource_status.get('updateTime')),
+            'state_security_status': security_status.get('state'),
+            'update_time_security_status': to_datetime_rfc3339(security_status.get('updateTime')),
+            'enabled_discovery_spec': discovery_spec.get('enabled'),
+            'csv_options_delimiter_discovery_spec': discovery_spec.get('csvOptions', {}).get('delimiter'),
+            'csv_options_encoding_discovery_spec': discovery_spec.get('csvOptions', {}).get('encoding'),
+            'json_options_encoding_discovery_spec': discovery_spec.get('jsonOptions', {}).get('encoding'),
+            'schedule_discovery_spec': discovery_spec.get('schedule'),
+            'state_discovery_status': discovery_status.get('state'),
+            'update_time_discovery_status': to_datetime_rfc3339(discovery_status.get('updateTime')),
+            'lastrun_time_discovery_status': to_datetime_rfc3339(discovery_status.get('lastRunTime')),
+            'data_items_discovery_status': int(discovery_stats.get('dataItems', 0)),
+            'data_size_discovery_status': int(discovery_stats.get('dataSize', 0)),
+            'stats_tables_discovery_status': int(discovery_stats.get('tables', 0)),
+            'lastrun_duration_discovery_status': float(last_run_duration.replace('s', '')) if last_run_duration else None}
+
+def refresh_events(events, credentials):
+    """
+    Re-fetch the tables, deleted datasets and assets touched by the events.
+
+    Each table, dataset or asset is fetched only once, with its current state, so the order of the events does not matter:
+    a resource that no longer exists (404) is deleted from the snapshot. A resource that can not be fetched for
+    another reason (ex: 403) is skipped, so it does not block the other events of the subscription.
+
+    Args:
+        events (list): list of events from parse_audit_log_event
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        changes (dict): list of rows by snapshot (tables, views, assets), rows to delete only have the key columns and deleted True,
+            and the (project, dataset) of the deleted datasets (datasets)
+
+    """
+    from googleapiclient.errors import HttpError
+
+    datasets = set(resource for kind, action, resource in events if kind == 'DATASET')
+    tables = set(resource for kind, action, resource in events if kind == 'TABLE')
+    assets = set(resource for kind, action, resource in events if kind == 'ASSET')
+    changes = {'tables': [], 'views': [], 'assets': [], 'datasets': []}
+
+    service = build_service('bigquery', 'v2', credentials=credentials)
+    for project, dataset in datasets:
+        print(f"dataset: {project}.{dataset}")
+        try:
+            service.datasets().get(projectId=project, datasetId=dataset).execute()
+        except HttpError as e:
+            if e.resp.status != 404:
+                print(f"Could not get dataset {project}.{dataset}, skipping: {e}")
+                continue
+            changes['datasets'].append((project, dataset))
+        #a dataset that exists again was created after the delete, its tables have their own events
+
+    #the tables of a deleted dataset are already deleted with it
+    tables = [table for table in tables if table[:2] not in changes['datasets']]
+    for project, dataset, table in tables:
+        print(f"table: {project}.{dataset}.{table}")
+        try:
+            resp = service.tables().get(projectId=project, datasetId=dataset, tableId=table).execute()
+        except HttpError as e:
+            if e.resp.status != 404:
+                #skip only this table (ex: 403 on a project the service account can not read) to not block the subscription
+                print(f"Could not get table {project}.{dataset}.{table}, skipping: {e}")
+                continue
+            changes['tables'].append({'project_id': project, 'dataset_id': dataset, 'table_id': table, 'deleted': True})
+            changes['views'].append({'project_id': project, 'dataset_id': dataset, 'view_id': table, 'deleted': True})
+            continue
+
+        if resp.get('type') == 'TABLE':
+            changes['tables'].append(dict(table_row(resp), deleted=False))
+        elif resp.get('type') == 'VIEW':
+            changes['views'].append(dict(view_row(resp), deleted=False))
+
+    service = build_service('dataplex', 'v1', credentials=credentials)
+    for asset in assets:
+        print(f"asset: {asset}")
+        try:
+            resp = service.projects().locations().lakes().zones().assets().get(name=asset).execute()
+        except HttpError as e:
+            if e.resp.status != 404:
+                print(f"Could not get asset {asset}, skipping: {e}")
+                continue
+            name = asset.split('/')
+            changes['assets'].append({'project_asset': name[1], 'location_asset': name[3], 'lake_asset': name[5],
+                                      'zone_asset': name[7], 'name_asset': name[9], 'deleted': True})
+            continue
+
+        changes['assets'].append(dict(asset_row(resp), deleted=False))
+
+    return changes
+
+def coerce_to_schema(df, table_schema):
+    """
+    Cast the DATETIME, BOOLEAN and INTEGER columns of a dataframe to the (nullable) types of pandas.
+
+    Columns that are only missing values (ex: a batch of deletes) are float NaN, that the Arrow conversion of
+    load_table_from_dataframe can not cast to timestamp, boolean or integer.
+
+    Args:
+        df (DataFrame): dataframe with the columns of the schema
+        table_schema (list): schema of the table
+
+    Returns:
+        df (DataFrame): dataframe with the columns cast
+
+    """
+    df = df.copy()
+    for field in table_schema:
+        column = field['name']
+        if field['type'] == 'DATETIME':
+            df[column] = pd.to_datetime(df[column])
+        elif field['type'] == 'BOOLEAN':
+            df[column] = df[column].astype('boolean')
+        elif field['type'] == 'INTEGER':
+            df[column] = df[column].astype('Int64')
+    return df
+
+def upsert_snapshot(client, rows, project_gcp, dataset_name, gbq_table, key_columns, table_schema, log_time):
+    """
+    Upsert rows into the last snapshot (max date_extraction) of an analysis table.
+
+    The rows are loaded to a staging table (<gbq_table>_events) and merged: rows marked as deleted are removed from
+    the snapshot, the others replace the row with the same key or are inserted.
+
+    Args:
+        client (google.cloud.bigquery.Client): bigquery client to load the staging table and run the merge
+        rows (list): list of rows from refresh_events
+        project_gcp (str): project of the analysis table
+        dataset_name (str): dataset of the analysis table
+        gbq_table (str): name of the analysis table
+        key_columns (list): columns that identify a row in a snapshot (besides date_extraction)
+        table_schema (list): schema of the analysis table
+        log_time (datetime): datetime of the update
+
+    """
+    if rows == []:
+        return
+
+    from google.cloud import bigquery
+
+    table = f"`{project_gcp}.{dataset_name}.{gbq_table}`"
+    staging_table = f"{gbq_table}_events"
+    last_snapshot = client.query(f"SELECT MAX(date_extraction) AS date_extraction FROM {table}").to_dataframe().date_extraction[0]
+    if pd.isnull(last_snapshot):
+        print(f"There is no snapshot in {gbq_table} to update")
+        return
+
+    columns = [field['name'] for field in table_schema]
+    df_rows = pd.DataFrame(rows).reindex(columns=columns + ['deleted'])
+    df_rows['date_extraction'] = pd.Timestamp(last_snapshot).date()
+    df_rows['log_time'] = log_time
+    staging_schema = table_schema + [{"name": "deleted", "type": "BOOLEAN", "mode": "NULLABLE"}]
+    df_rows = coerce_to_schema(df_rows, staging_schema)
+    job_config = bigquery.LoadJobConfig(schema=[bigquery.SchemaField.from_api_repr(field) for field in staging_schema],
+                                        write_disposition='WRITE_TRUNCATE')
+    client.load_table_from_dataframe(df_rows, f"{project_gcp}.{dataset_name}.{staging_table}", job_config=job_config).result()
+
+    on = ' AND '.join(f"T.{column} = S.{column}" for column in ['date_extraction'] + key_columns)
+    merge = f"""
+        MERGE {table} T
+        USING `{project_gcp}.{dataset_name}.{staging_table}` S
+        ON {on}
+        WHEN MATCHED AND S.deleted THEN DELETE
+        WHEN MATCHED THEN UPDATE SET {', '.join(f"{column} = S.{column}" for column in columns)}
+        WHEN NOT MATCHED AND NOT S.deleted THEN INSERT ({', '.join(columns)}) VALUES ({', '.join(f"S.{column}" for column in columns)})
+    """
+    client.query(merge).result()
+    print(f"{len(rows)} rows upserted in {gbq_table} (snapshot {last_snapshot})")
+
+def delete_datasets(client, datasets, project_gcp, dataset_name, gbq_table):
+    """
+    Delete the rows of deleted datasets from the last snapshot (max date_extraction) of an analysis table.
+
+    Args:
+        client (google.cloud.bigquery.Client): bigquery client to run the delete
+        datasets (list): list of (project, dataset) deleted
+        project_gcp (str): project of the analysis table
+        dataset_name (str): dataset of the analysis table
+        gbq_table (str): name of the analysis table with project_id and dataset_id columns
+
+    """
+    if datasets == []:
+        return
+
+    table = f"`{project_gcp}.{dataset_name}.{gbq_table}`"
+    condition = ' OR '.join(f"(project_id = '{project}' AND dataset_id = '{dataset}')" for project, dataset in datasets)
+    delete = f"""
+        DELETE FROM {table}
+        WHERE date_extraction = (SELECT MAX(date_extraction) FROM {table})
+        AND ({condition})
+    """
+    client.query(delete).result()
+    print(f"{len(datasets)} datasets deleted from {gbq_table}")
+
+def pull_events(subscriber, subscription, max_messages):
+    """
+    Pull a batch of audit log events from a Pub/Sub subscription (or the Pub/Sub emulator, with PUBSUB_EMULATOR_HOST).
+
+    Args:
+        subscriber (google.cloud.pubsub_v1.SubscriberClient): Pub/Sub subscriber client
+        subscription (str): subscription path (projects/<project>/subscriptions/<subscription>)
+        max_messages (int): max number of messages in the batch
+
+    Returns:
+        ack_ids (list): ack ids of the messages pulled, including the messages that are not a LogEntry
+        log_entries (list): LogEntry of each valid message
+
+    """
+    response = subscriber.pull(request={'subscription': subscription, 'max_messages': max_messages})
+    ack_ids = []
+    log_entries = []
+    for message in response.received_messages:
+        ack_ids.append(message.ack_id) #invalid messages are acked too, or they would be delivered again forever
+        try:
+            log_entry = json.loads(message.message.data.decode('utf-8'))
+        except ValueError as e:
+            print(f"Skipping message {message.message.message_id} that is not a LogEntry: {e}")
+            continue
+        if not isinstance(log_entry, dict):
+            print(f"Skipping message {message.message.message_id} that is not a LogEntry")
+            continue
+        log_entries.append(log_entry)
+    return ack_ids, log_entries
+
+
+#Snapshots updated by the events: (analysis table, key columns, rows of refresh_events, has the rows of bigquery datasets)
+snapshots = [('bigquery_tables_analysis', ['project_id', 'dataset_id', 'table_id'], 'tables', True),
+             ('bigquery_views_analysis', ['project_id', 'dataset_id', 'view_id'], 'views', True),
+             ('dataplex_assets_analysis', ['project_asset', 'location_asset', 'lake_asset', 'zone_asset', 'name_asset'], 'assets', False)]
+
+EVENTS_MAX_MESSAGES = 500
+EVENTS_IDLE_SLEEP_SECONDS = 30
+
+def run(context, subscription, subscriber=None, client=None, max_messages=EVENTS_MAX_MESSAGES, run_forever=False,
+        idle_sleep_seconds=EVENTS_IDLE_SLEEP_SECONDS):
+    """
+    Consume the audit log events of a subscription and upsert the touched tables, views and assets in the last snapshots.
+
+    No batch is pulled after the deadline (see deadline_reached), the messages left stay in the subscription for the next run.
+
+    Args:
+        context (RunContext): context of the run
+        subscription (str): subscription of the logging sink with the admin activity audit logs of BigQuery and Dataplex
+        subscriber (google.cloud.pubsub_v1.SubscriberClient): client with pull and acknowledge, None to create a
+            Pub/Sub subscriber (that uses the emulator with PUBSUB_EMULATOR_HOST)
+        client (google.cloud.bigquery.Client): bigquery client of the upserts, None to create one in project_gcp
+        max_messages (int): max number of messages by batch
+        run_forever (bool): False to stop when the subscription is empty (Cloud Run Job), True to keep listening
+        idle_sleep_seconds (int): seconds to wait for new messages when the subscription is empty and run_forever is True
+
+    """
+    if client is None:
+        from google.cloud import bigquery
+        client = bigquery.Client(project=context.project_gcp)
+    if subscriber is None:
+        from google.cloud import pubsub_v1
+        subscriber = pubsub_v1.SubscriberClient()
+
+    while True:
+        if deadline_reached():
+            print('Deadline reached, the events left stay in the subscription')
+            break
+        ack_ids, log_entries = pull_events(subscriber, subscription, max_messages)
+        if ack_ids == []:
+            if not run_forever:
+                break
+            time.sleep(idle_sleep_seconds)
+            continue
+
+        events = [parse_audit_log_event(log_entry) for log_entry in log_entries]
+        events = [event for event in events if event is not None]
+        print(f"{len(events)} table, dataset or asset events in {len(ack_ids)} messages")
+
+        changes = refresh_events(events, context.credentials)
+        log_time = datetime.today()
+        for gbq_table, key_columns, rows, dataset_rows in snapshots:
+            if dataset_rows:
+                delete_datasets(client, changes['datasets'], context.project_gcp, context.dataset_name, gbq_table)
+            upsert_snapshot(client, changes[rows], context.project_gcp, context.dataset_name, gbq_table, key_columns,
+                            load_table_schema(gbq_table), log_time)
+
+        #ack only after the snapshots are updated, so failed batches are delivered again
+        subscriber.acknowledge(request={'subscription': subscription, 'ack_ids': ack_ids})
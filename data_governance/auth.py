@@ -0,0 +1,56 @@
+# Credentials shared by all extractors
+
+
+SCOPES = ['https://www.googleapis.com/auth/cloud-platform']
+
+def get_credentials_from_service_account(service_account, scopes=['https://www.googleapis.com/auth/cloud-platform'], key_lifetime_seconds=3600):
+    """Return Google Oauth2 Credentials Object
+
+    Required Permissions:
+        Service Account Token Creator
+
+    Parameters:
+        service_account (str): Service account 
+        scopes (list): Scopes list
+        key_lifetime_seconds (int): Credentials Lifetime in Seconds
+
+    Returns:    
+        credentials (google.oauth2.credentials.Credentials): Google Oauth2 Credentials Object
+
+    Prerequisites to run on-premisses:
+        Google SDK installed and run the follow command:
+            - gcloud auth application-default login
+    """
+
+    from google.cloud import iam_credentials
+    from google.oauth2 import credentials
+    from google.protobuf import duration_pb2
+
+    client = iam_credentials.IAMCredentialsClient()
+    lifetime = duration_pb2.Duration()
+    lifetime.FromSeconds(seconds=key_lifetime_seconds)
+    request = iam_credentials.GenerateAccessTokenRequest(name=service_account,
+                                                         scope=scopes,
+                                                         lifetime=lifetime)
+    access_token = client.generate_access_token(request)
+    return credentials.Credentials(token=access_token.access_token)
+
+def get_credentials(service_account=None, scopes=SCOPES):
+    """
+    Return the credentials of the service account, or the application default credentials if there is no service account.
+
+    Args:
+        service_account (str): service account to impersonate, None to use the application default credentials
+        scopes (list): scopes list
+
+    Returns:
+        credentials (google.auth.credentials.Credentials): google credentials
+
+    """
+    if service_account:
+        return get_credentials_from_service_account(service_account, scopes)
+
+    import google.auth
+
+    credentials, _ = google.auth.default(scopes=scopes)
+    return credentials
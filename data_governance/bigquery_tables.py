@@ -0,0 +1,606 @@
+# Extractor of bigquery_tables_analysis: information about all tables in organization (snapshot of the day)
+import heapq
+import math
+import random
+import threading
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta
+
+from data_governance.context import upload_dataframe
+from data_governance.deadline import build_coverage, coverage_priority, deadline_reached, get_last_coverage
+from data_governance.projects import list_datasets_locations
+from data_governance.transport import HTTP_POOL_SIZES, build_service, set_pool_size
+
+
+#bigquery informations
+gbq_table = 'bigquery_tables_analysis'
+gbq_table_storage_billing = 'bigquery_storage_billing_analysis'
+gbq_table_coverage = 'crawl_coverage'
+
+def list_table_items(project, dataset, credentials):
+
+    """
+    List all tables (type TABLE) for a project and dataset in gcp, as returned by tables().list.
+
+    The items have type, creationTime, timePartitioning, clustering, labels and tableReference,
+    but not the size, the description and the lastModifiedTime of the tables.
+
+    Args:
+        project (str): project name on gcp to search for tables
+        dataset (str): dataset name on gcp to search for tables
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        list_tables (list): list of tables resources
+
+    """
+
+    service = build_service('bigquery', 'v2', credentials=credentials)
+    pageToken_list_tables=""
+    list_tables = []
+
+    while pageToken_list_tables is not None:
+
+        rqst = service.tables().list(projectId=project, datasetId=dataset, pageToken=pageToken_list_tables, maxResults=1000)
+        resp = rqst.execute()
+        if 'tables' in resp.keys():
+            for i in range(0,len(resp['tables'])):
+                if resp['tables'][i]['type']=='TABLE':
+                    list_tables.append(resp['tables'][i])
+                else: None
+            pageToken_list_tables = resp.get('nextPageToken')
+        else:
+            print(f"There are no tables in the dataset {project}.{dataset}")
+            pageToken_list_tables = None
+
+    return list_tables
+
+def get_tables(project, dataset, table_ids, credentials):
+
+    """
+    Get the informations of tables for a project and dataset in gcp, stopping at the deadline (see deadline_reached).
+
+    Args:
+        project (str): project name on gcp of tables
+        dataset (str): dataset name on gcp of tables
+        table_ids (list): list of table ids to get
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        df_info_tables (DataFrame): dataframe with tables infos, without the tables not fetched before the deadline
+
+    """
+    import pandas as pd
+
+    service = build_service('bigquery', 'v2', credentials=credentials)
+    list_resp = []
+
+    for table in table_ids:
+        if deadline_reached():
+            break
+        print(f"table: {table}")
+
+        rqst = service.tables().get(projectId=project, datasetId=dataset, tableId=table)
+        list_resp.append(rqst.execute())
+
+    return pd.json_normalize(list_resp)
+
+
+#Parallel crawl settings
+MAX_WORKERS = HTTP_POOL_SIZES['bigquery.googleapis.com'] #one pooled connection by worker
+TABLES_PER_WORK_UNIT = 200 #datasets expected to have more tables are split in table ranges
+ESTIMATED_SECONDS_PER_TABLE = 0.25 #used only to report the expected finish time
+
+#When to call tables().get, the other tables are built only from the tables().list items with stale sizes:
+#   ALWAYS - every table
+#   NEVER - no table, list only
+#   CHANGED - only tables created or recreated since the last run (not in the previous snapshot with the same creation time)
+#   SAMPLE - only a random fraction (TABLES_GET_SAMPLE_FRACTION) of the tables
+TABLES_GET_MODE = 'ALWAYS'
+TABLES_GET_SAMPLE_FRACTION = 0.1
+#Days of history read to find the last snapshot of each dataset and table
+TABLES_HISTORY_DAYS = 30
+
+#Size columns returned only by tables().get
+SIZE_COLUMNS = ['num_rows', 'num_bytes', 'num_partitions', 'num_time_travel_physical_bytes',
+                'num_total_logical_bytes', 'num_active_logical_bytes', 'num_long_term_logical_bytes',
+                'num_total_physical_bytes', 'num_active_physical_bytes', 'num_long_term_physical_bytes']
+
+#Work unit with a range (part of parts) of the tables of a dataset
+WorkUnit = namedtuple('WorkUnit', ['estimated_tables', 'project', 'dataset', 'location', 'part', 'parts'])
+
+def get_previous_table_counts(project_gcp, dataset_name, gbq_table, history_days=TABLES_HISTORY_DAYS):
+    """
+    Get the number of tables by project and dataset in the last snapshot where each dataset appears in the tables analysis.
+
+    The last snapshot is taken by dataset and not for the whole table, so the projects not crawled by the last
+    run (stopped by the deadline, see crawl_coverage) still have the counts of their previous runs.
+
+    Args:
+        project_gcp (str): project of the tables analysis table
+        dataset_name (str): dataset of the tables analysis table
+        gbq_table (str): name of the tables analysis table
+        history_days (int): days of history to read
+
+    Returns:
+        table_counts (dict): number of tables by (project_id, dataset_id), empty if there is no previous snapshot
+
+    """
+    import pandas as pd
+
+    table = f"`{project_gcp}.{dataset_name}.{gbq_table}`"
+    query = f"""
+        SELECT project_id, dataset_id, COUNT(*) AS num_tables
+        FROM {table}
+        WHERE date_extraction >= DATE_SUB(CURRENT_DATE(), INTERVAL {history_days} DAY)
+        GROUP BY project_id, dataset_id, date_extraction
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY project_id, dataset_id ORDER BY date_extraction DESC) = 1
+    """
+    try:
+        df_counts = pd.read_gbq(query, project_id=project_gcp)
+    except Exception as e:
+        print(f"Could not read the previous snapshot, crawling without history: {e}")
+        return {}
+
+    return {(row.project_id, row.dataset_id): int(row.num_tables) for row in df_counts.itertuples(index=False)}
+
+def get_previous_tables(project_gcp, dataset_name, gbq_table, history_days=TABLES_HISTORY_DAYS):
+    """
+    Get the creation time and the sizes of each table in the last snapshot where it appears in the tables analysis.
+
+    Args:
+        project_gcp (str): project of the tables analysis table
+        dataset_name (str): dataset of the tables analysis table
+        gbq_table (str): name of the tables analysis table
+        history_days (int): days of history to read
+
+    Returns:
+        df_previous_tables (DataFrame): dataframe with project_id, dataset_id, table_id, creation_time (epoch millis)
+            and the size columns, empty if there is no previous snapshot
+
+    """
+    import pandas as pd
+
+    table = f"`{project_gcp}.{dataset_name}.{gbq_table}`"
+    query = f"""
+        SELECT project_id, dataset_id, table_id, UNIX_MILLIS(TIMESTAMP(creation_time)) AS creation_time, {', '.join(SIZE_COLUMNS)}
+        FROM {table}
+        WHERE date_extraction >= DATE_SUB(CURRENT_DATE(), INTERVAL {history_days} DAY)
+        QUALIFY ROW_NUMBER() OVER (PARTITION BY project_id, dataset_id, table_id ORDER BY date_extraction DESC) = 1
+    """
+    try:
+        return pd.read_gbq(query, project_id=project_gcp)
+    except Exception as e:
+        print(f"Could not read the previous snapshot, getting all tables: {e}")
+        return pd.DataFrame(columns=['project_id', 'dataset_id', 'table_id', 'creation_time'] + SIZE_COLUMNS)
+
+def carry_previous_sizes(info_tables_bigquery, df_previous_tables):
+    """
+    Fill the sizes of the tables not fetched with tables().get with their last known sizes.
+
+    The sizes are only carried from the same table (same creation time), the tables keep size_stale True
+    and the tables without a previous size keep null sizes.
+
+    Args:
+        info_tables_bigquery (DataFrame): dataframe with tables infos, after the columns treatment
+        df_previous_tables (DataFrame): dataframe from get_previous_tables
+
+    Returns:
+        info_tables_bigquery (DataFrame): dataframe with the last known sizes of the stale tables
+
+    """
+    import pandas as pd
+
+    keys = ['project_id', 'dataset_id', 'table_id', 'creation_time']
+    df_previous = df_previous_tables.assign(creation_time=pd.to_datetime(pd.to_numeric(df_previous_tables.creation_time), unit='ms'))
+    df_previous = df_previous.drop_duplicates(keys).set_index(keys)
+
+    stale = info_tables_bigquery.size_stale
+    index = pd.MultiIndex.from_frame(info_tables_bigquery.loc[stale, keys])
+    for column in SIZE_COLUMNS:
+        previous_sizes = pd.to_numeric(df_previous[column]).reindex(index).to_numpy()
+        info_tables_bigquery.loc[stale, column] = pd.array(previous_sizes, dtype='Float64').astype('Int64')
+    return info_tables_bigquery
+
+def need_table_get(table_item, get_mode=TABLES_GET_MODE, previous_tables_creation=None, sample_fraction=TABLES_GET_SAMPLE_FRACTION):
+    """
+    Check if a table listed by tables().list must also be fetched with tables().get.
+
+    Args:
+        table_item (dict): table resource from tables().list
+        get_mode (str): ALWAYS, NEVER, CHANGED or SAMPLE (see TABLES_GET_MODE)
+        previous_tables_creation (dict): creation time by (project_id, dataset_id, table_id) in the previous snapshot, used by CHANGED
+        sample_fraction (float): fraction of tables to get, used by SAMPLE
+
+    Returns:
+        need_get (bool): True if the table must be fetched
+
+    """
+    if get_mode == 'ALWAYS':
+        return True
+    elif get_mode == 'NEVER':
+        return False
+    elif get_mode == 'CHANGED':
+        reference = table_item['tableReference']
+        key = (reference['projectId'], reference['datasetId'], reference['tableId'])
+        previous_creation = (previous_tables_creation or {}).get(key)
+        return previous_creation is None or previous_creation != int(table_item['creationTime'])
+    elif get_mode == 'SAMPLE':
+        return random.random() < sample_fraction
+    else:
+        raise ValueError(f"Invalid tables get mode: {get_mode}")
+
+def build_work_units(datasets_by_project, table_counts, tables_per_unit=TABLES_PER_WORK_UNIT, project_priority=None):
+    """
+    Split datasets in work units of table ranges sorted longest first (LPT) by the previous table counts.
+
+    Datasets not found in the previous snapshots are estimated with the mean number of tables by dataset,
+    crawl_work_unit splits again the units that have more tables than expected once the dataset is listed.
+
+    Args:
+        datasets_by_project (dict): location by dataset by project
+        table_counts (dict): number of tables by (project_id, dataset_id) in the previous snapshot
+        tables_per_unit (int): max number of tables expected in a work unit
+        project_priority (dict): rank by project (see coverage_priority), lower ranks are dispatched first
+
+    Returns:
+        work_units (list): list of WorkUnit sorted by project priority and estimated_tables descending
+
+    """
+    default_count = sum(table_counts.values()) / len(table_counts) if table_counts else 1
+    work_units = []
+    for project, datasets in datasets_by_project.items():
+        for dataset, location in datasets.items():
+            estimated_tables = table_counts.get((project, dataset), default_count)
+            parts = max(1, math.ceil(estimated_tables / tables_per_unit))
+            for part in range(parts):
+                work_units.append(WorkUnit(estimated_tables / parts, project, dataset, location, part, parts))
+
+    project_priority = project_priority or {}
+    work_units.sort(key=lambda unit: (project_priority.get(unit.project, 0), -unit.estimated_tables))
+    return work_units
+
+def expected_crawl_seconds(work_units, workers=MAX_WORKERS, seconds_per_table=ESTIMATED_SECONDS_PER_TABLE):
+    """
+    Simulate the dispatch of the work units to the workers and return the expected crawl time.
+
+    Args:
+        work_units (list): list of WorkUnit in dispatch order
+        workers (int): number of parallel workers
+        seconds_per_table (float): expected seconds to get one table
+
+    Returns:
+        seconds (float): expected seconds until the last worker finishes
+
+    """
+    loads = [0.0] * workers
+    for unit in work_units:
+        heapq.heapreplace(loads, loads[0] + unit.estimated_tables) #next unit goes to the first free worker
+    return max(loads) * seconds_per_table
+
+def split_work_unit(unit, num_tables, tables_per_unit=TABLES_PER_WORK_UNIT):
+    """
+    Split the range of tables of a work unit that has more tables than tables_per_unit.
+
+    The unit part of parts is split in part * splits + i of parts * splits, so the new units cover exactly the
+    same tables as the unit.
+
+    Args:
+        unit (WorkUnit): work unit with its range of tables
+        num_tables (int): actual number of tables in the range of the unit
+        tables_per_unit (int): max number of tables in a work unit
+
+    Returns:
+        work_units (list): list of WorkUnit that cover the range of the unit, only the unit itself if it is not split
+
+    """
+    splits = max(1, math.ceil(num_tables / tables_per_unit))
+    if splits == 1:
+        return [unit]
+    return [WorkUnit(num_tables / splits, unit.project, unit.dataset, unit.location, unit.part * splits + split, unit.parts * splits)
+            for split in range(splits)]
+
+#List items of the datasets being crawled, dropped after the last work unit of the dataset takes its range
+table_items_cache = {}
+table_items_remaining = {} #work units of the dataset that did not take their range yet
+table_items_locks = {}
+table_items_lock = threading.Lock()
+
+def crawl_work_unit(unit, credentials, get_mode=TABLES_GET_MODE, previous_tables_creation=None, sample_fraction=TABLES_GET_SAMPLE_FRACTION):
+    """
+    Get the informations of the range of tables of a work unit.
+
+    The tables of a dataset are listed only once and shared by all work units of the dataset. A unit with more
+    tables than TABLES_PER_WORK_UNIT (ex: a dataset not in the previous snapshots) is split again once the dataset
+    is listed: only the first split is crawled and the others are returned to be dispatched to the other workers.
+    Tables that do not need a tables().get (see need_table_get) are built from the list items and marked with sizeStale.
+
+    Args:
+        unit (WorkUnit): work unit to crawl
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+        get_mode (str): ALWAYS, NEVER, CHANGED or SAMPLE (see TABLES_GET_MODE)
+        previous_tables_creation (dict): creation time by (project_id, dataset_id, table_id) in the previous snapshot, used by CHANGED
+        sample_fraction (float): fraction of tables to get, used by SAMPLE
+
+    Returns:
+        df_info_tables (DataFrame): dataframe with tables infos, None if the deadline was reached before the unit started
+        split_units (list): list of WorkUnit split from the unit that still have to be crawled
+        complete (bool): False if the deadline was reached before all tables of the unit were fetched
+
+    """
+    import pandas as pd
+
+    if deadline_reached():
+        return None, [], False
+
+    key = (unit.project, unit.dataset)
+    with table_items_lock:
+        dataset_lock = table_items_locks.setdefault(key, threading.Lock())
+    with dataset_lock:
+        if key not in table_items_cache:
+            print(f"------------Dataset: {unit.project}.{unit.dataset}------------")
+            table_items_cache[key] = list_table_items(unit.project, unit.dataset, credentials)
+            table_items_remaining[key] = unit.parts
+        table_items = table_items_cache[key]
+
+        start = len(table_items) * unit.part // unit.parts
+        end = len(table_items) * (unit.part + 1) // unit.parts
+        unit, *split_units = split_work_unit(unit, end - start)
+        if split_units != []:
+            print(f"Splitting {unit.project}.{unit.dataset} ({end - start} tables) in {len(split_units) + 1} work units")
+            start = len(table_items) * unit.part // unit.parts
+            end = len(table_items) * (unit.part + 1) // unit.parts
+        table_items = table_items[start:end]
+
+        #this unit took its range and the split units will take theirs
+        table_items_remaining[key] += len(split_units) - 1
+        if table_items_remaining[key] == 0:
+            del table_items_cache[key], table_items_remaining[key]
+            with table_items_lock:
+                del table_items_locks[key]
+
+    list_get = []
+    list_only = []
+    for table_item in table_items:
+        if need_table_get(table_item, get_mode, previous_tables_creation, sample_fraction):
+            list_get.append(table_item['tableReference']['tableId'])
+        else:
+            list_only.append(dict(table_item, location=unit.location, sizeStale=True))
+
+    df_info_tables = get_tables(unit.project, unit.dataset, list_get, credentials)
+    df_info_tables['sizeStale'] = False
+    complete = len(df_info_tables) == len(list_get)
+    return pd.concat([df_info_tables, pd.json_normalize(list_only)], ignore_index=True), split_units, complete
+
+
+#Storage prices in USD per GiB by month (multi-region US), used to estimate the cost of each billing model
+LOGICAL_ACTIVE_PRICE_GIB = 0.02
+LOGICAL_LONG_TERM_PRICE_GIB = 0.01
+PHYSICAL_ACTIVE_PRICE_GIB = 0.04
+PHYSICAL_LONG_TERM_PRICE_GIB = 0.02
+GIB = 1024 ** 3
+
+def aggregate_storage_billing(info_tables_bigquery, covered_projects=None):
+    """
+    Aggregate the storage of the tables by dataset and by project with the estimated cost of each billing model.
+
+    Under physical billing the time travel bytes are billed as active physical bytes, and they are already
+    included in num_active_physical_bytes. Tables with stale sizes (not fetched with tables().get) are counted
+    in num_tables_size_stale and summed with their last known sizes. The totals and costs of a dataset or project
+    are null if the size of one of its tables is unknown, or if the project was not fully crawled before the deadline,
+    instead of sums that look complete.
+
+    Args:
+        info_tables_bigquery (DataFrame): dataframe with tables infos, after the columns treatment
+        covered_projects (set): projects fully crawled before the deadline, None if all projects were crawled
+
+    Returns:
+        df_storage_billing (DataFrame): dataframe with one row by dataset (aggregation_level DATASET)
+            and one row by project (aggregation_level PROJECT)
+
+    """
+    import pandas as pd
+
+    bytes_columns = ['num_total_logical_bytes', 'num_active_logical_bytes', 'num_long_term_logical_bytes',
+                     'num_total_physical_bytes', 'num_active_physical_bytes', 'num_long_term_physical_bytes',
+                     'num_time_travel_physical_bytes']
+    aggregations = {column: (column, 'sum') for column in ['num_rows'] + bytes_columns}
+    info_tables_bigquery = info_tables_bigquery.assign(size_unknown=info_tables_bigquery.num_total_logical_bytes.isna())
+
+    def aggregate(keys):
+        df_aggregates = info_tables_bigquery.groupby(keys, as_index=False).agg(
+            num_tables=('table_id', 'count'), num_tables_size_stale=('size_stale', 'sum'),
+            num_tables_size_unknown=('size_unknown', 'sum'), **aggregations)
+        partial = df_aggregates.num_tables_size_unknown > 0
+        if covered_projects is not None:
+            partial |= ~df_aggregates.project_id.isin(covered_projects)
+        df_aggregates.loc[partial, ['num_rows'] + bytes_columns] = pd.NA
+        return df_aggregates
+
+    df_datasets = aggregate(['date_extraction', 'project_id', 'dataset_id'])
+    df_datasets['aggregation_level'] = 'DATASET'
+
+    df_projects = aggregate(['date_extraction', 'project_id'])
+    df_projects['aggregation_level'] = 'PROJECT'
+    df_projects['dataset_id'] = None
+
+    df_storage_billing = pd.concat([df_datasets, df_projects], ignore_index=True)
+
+    df_storage_billing['estimated_logical_cost'] = (df_storage_billing.num_active_logical_bytes * LOGICAL_ACTIVE_PRICE_GIB
+                                                    + df_storage_billing.num_long_term_logical_bytes * LOGICAL_LONG_TERM_PRICE_GIB) / GIB
+    df_storage_billing['estimated_physical_cost'] = (df_storage_billing.num_active_physical_bytes * PHYSICAL_ACTIVE_PRICE_GIB
+                                                     + df_storage_billing.num_long_term_physical_bytes * PHYSICAL_LONG_TERM_PRICE_GIB) / GIB
+    df_storage_billing['estimated_time_travel_cost'] = df_storage_billing.num_time_travel_physical_bytes * PHYSICAL_ACTIVE_PRICE_GIB / GIB
+
+    columns_order = ['date_extraction', 'aggregation_level', 'project_id', 'dataset_id', 'num_tables', 'num_tables_size_stale'] + ['num_rows'] + bytes_columns + \
+                    ['estimated_logical_cost', 'estimated_physical_cost', 'estimated_time_travel_cost']
+    return df_storage_billing[columns_order]
+
+
+def run(context, get_mode=TABLES_GET_MODE, sample_fraction=TABLES_GET_SAMPLE_FRACTION, workers=MAX_WORKERS):
+    """
+    Crawl all tables of the projects with the big query API enabled and insert the snapshot of the day,
+    the storage billing aggregates and the coverage markers in bigquery.
+
+    Args:
+        context (RunContext): context of the run
+        get_mode (str): ALWAYS, NEVER, CHANGED or SAMPLE (see TABLES_GET_MODE)
+        sample_fraction (float): fraction of tables to get, used by SAMPLE
+        workers (int): number of parallel workers
+
+    """
+    credentials = context.credentials
+    project_gcp = context.project_gcp
+    dataset_name = context.dataset_name
+    date_extraction = context.date_extraction
+    log_time = context.log_time
+    list_projects_with_bigquery_api_enabled = context.bigquery_projects
+    #pandas is imported only after the first API call, so the first calls of the crawl do not wait for its import
+    import pandas as pd
+
+    #One pooled connection by worker, the workers beyond the pool size would only wait for a connection
+    set_pool_size('bigquery.googleapis.com', max(workers, HTTP_POOL_SIZES['bigquery.googleapis.com']))
+
+    #Number of tables by project and dataset in the previous snapshot, to crawl the largest first
+    previous_table_counts = get_previous_table_counts(project_gcp, dataset_name, gbq_table)
+    #Creation time and last known sizes of each table, used by the modes that do not get every table
+    df_previous_tables = get_previous_tables(project_gcp, dataset_name, gbq_table) if get_mode != 'ALWAYS' else None
+    previous_tables_creation = {}
+    if get_mode == 'CHANGED':
+        previous_tables_creation = {(row.project_id, row.dataset_id, row.table_id): row.creation_time
+                                    for row in df_previous_tables.itertuples(index=False)}
+    previous_project_counts = {}
+    for (project, dataset), num_tables in previous_table_counts.items():
+        previous_project_counts[project] = previous_project_counts.get(project, 0) + num_tables
+    list_projects_with_bigquery_api_enabled.sort(key=lambda project: previous_project_counts.get(project, 0), reverse=True)
+
+    #Projects not covered for the longest time are crawled first, so a job stopped by the deadline converges to full coverage
+    last_coverage = get_last_coverage(project_gcp, dataset_name, gbq_table_coverage, gbq_table)
+    project_priority = coverage_priority(list_projects_with_bigquery_api_enabled, last_coverage)
+    list_projects_with_bigquery_api_enabled.sort(key=lambda project: project_priority[project])
+
+    #filtering only important columns, you can add more if you want
+    cols_table_filter = ['tableReference.projectId','tableReference.datasetId', 'tableReference.tableId', 'location',
+                        'timePartitioning.type', 'timePartitioning.field', 'clustering.fields', 'creationTime', 'lastModifiedTime', 'numRows', 'numBytes', 'description',
+                        'requirePartitionFilter','numPartitions','numTimeTravelPhysicalBytes',
+                        'numTotalLogicalBytes','numActiveLogicalBytes','numLongTermLogicalBytes',
+                        'numTotalPhysicalBytes','numActivePhysicalBytes',
+                        'numLongTermPhysicalBytes','sizeStale']
+    info_tables_bigquery = pd.DataFrame(columns=cols_table_filter)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        #List datasets of each project
+        print('Listing datasets of projects')
+        list_datasets_by_project = executor.map(lambda project: None if deadline_reached() else list_datasets_locations(project, credentials),
+                                                list_projects_with_bigquery_api_enabled)
+        datasets_by_project = dict(zip(list_projects_with_bigquery_api_enabled, list_datasets_by_project))
+        covered_projects = set(project for project, datasets in datasets_by_project.items() if datasets is not None)
+        datasets_by_project = {project: datasets for project, datasets in datasets_by_project.items() if datasets is not None}
+
+        #Work units are dispatched longest first, so no large dataset is left to the end of the crawl
+        work_units = build_work_units(datasets_by_project, previous_table_counts, project_priority=project_priority)
+        start_crawl = datetime.today()
+        expected_finish = start_crawl + timedelta(seconds=expected_crawl_seconds(work_units, workers))
+        print(f"Crawling {len(work_units)} work units with {workers} workers, expected finish time: {expected_finish}")
+
+        #Units split again after the listing of their dataset are dispatched as soon as they are known
+        def submit(unit):
+            return executor.submit(crawl_work_unit, unit, credentials, get_mode, previous_tables_creation, sample_fraction)
+
+        pending = {submit(unit): unit for unit in work_units}
+        list_info_tables = []
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                unit = pending.pop(future)
+                info_tables, split_units, complete = future.result()
+                if not complete:
+                    #Projects with work units not started or not finished before the deadline are not covered
+                    covered_projects.discard(unit.project)
+                if info_tables is not None:
+                    list_info_tables.append(info_tables.reindex(columns = cols_table_filter))
+                pending.update({submit(split_unit): split_unit for split_unit in split_units})
+
+    #List items of the datasets with work units not started before the deadline
+    table_items_cache.clear()
+    table_items_remaining.clear()
+    table_items_locks.clear()
+    if deadline_reached():
+        print(f"Deadline reached, {len(covered_projects)} of {len(list_projects_with_bigquery_api_enabled)} projects covered")
+
+    finish_crawl = datetime.today()
+    print(f"Expected finish time: {expected_finish} ({(expected_finish - start_crawl).total_seconds():.0f}s), "
+          f"actual finish time: {finish_crawl} ({(finish_crawl - start_crawl).total_seconds():.0f}s)")
+
+    info_tables_bigquery = pd.concat([info_tables_bigquery] + list_info_tables, ignore_index=True).reset_index(drop = True)
+    info_tables_bigquery = info_tables_bigquery[cols_table_filter]
+
+    #renaming columns
+    info_tables_bigquery.rename(columns = {'tableReference.projectId':'project_id', 
+                                            'tableReference.datasetId':'dataset_id', 
+                                            'tableReference.tableId':'table_id', 
+                                            'timePartitioning.type':'timepartition_type', 
+                                            'timePartitioning.field':'timepartition_field', 
+                                            'clustering.fields':'clustering_fields', 
+                                            'creationTime':'creation_time', 
+                                            'lastModifiedTime':'last_modified_time',
+                                            'requirePartitionFilter': 'require_partition_filter', 
+                                            'numRows':'num_rows', 
+                                            'numBytes':'num_bytes',
+                                            'numPartitions':'num_partitions',
+                                            'numTimeTravelPhysicalBytes':'num_time_travel_physical_bytes',
+                                            'numTotalLogicalBytes':'num_total_logical_bytes',
+                                            'numActiveLogicalBytes':'num_active_logical_bytes',
+                                            'numLongTermLogicalBytes':'num_long_term_logical_bytes',
+                                            'numTotalPhysicalBytes':'num_total_physical_bytes',
+                                            'numActivePhysicalBytes':'num_active_physical_bytes',
+                                            'numLongTermPhysicalBytes':'num_long_term_physical_bytes',
+                                            'sizeStale':'size_stale'}, inplace=True)
+
+    info_tables_bigquery['date_extraction'] = date_extraction #day of extraction
+    info_tables_bigquery['log_time'] = log_time #datetime of extraction
+
+    columns_order = ['date_extraction','project_id','dataset_id', 'table_id', 'location',
+                        'timepartition_type', 'timepartition_field', 'clustering_fields', 'creation_time', 
+                        'last_modified_time', 'description','require_partition_filter',
+                        'num_rows','num_bytes','num_partitions','num_time_travel_physical_bytes','num_total_logical_bytes','num_active_logical_bytes','num_long_term_logical_bytes',
+                        'num_total_physical_bytes','num_active_physical_bytes','num_long_term_physical_bytes', 'size_stale', 'log_time']
+                    
+    info_tables_bigquery = info_tables_bigquery[columns_order]
+
+    #Treating dataframe columns
+    info_tables_bigquery.size_stale = info_tables_bigquery.size_stale.fillna(False).astype(bool)
+
+    #Size columns are zero filled only for tables fetched with tables().get, tables with stale sizes keep them null
+    for column in SIZE_COLUMNS:
+        info_tables_bigquery[column] = info_tables_bigquery[column].map(int, na_action='ignore').astype('Int64')
+        info_tables_bigquery.loc[~info_tables_bigquery.size_stale, column] = info_tables_bigquery.loc[~info_tables_bigquery.size_stale, column].fillna(0)
+
+    info_tables_bigquery.date_extraction = pd.to_datetime(info_tables_bigquery['date_extraction'])
+    info_tables_bigquery.clustering_fields = info_tables_bigquery.clustering_fields.apply(str)
+    info_tables_bigquery.clustering_fields = info_tables_bigquery.clustering_fields.replace('nan', None)
+    info_tables_bigquery.creation_time = pd.to_datetime(pd.to_numeric(info_tables_bigquery['creation_time']), unit='ms')
+    info_tables_bigquery.last_modified_time = pd.to_datetime(pd.to_numeric(info_tables_bigquery['last_modified_time']), unit='ms')
+    info_tables_bigquery.require_partition_filter = info_tables_bigquery.require_partition_filter.fillna(False).astype(bool).astype('boolean') #not returned when False
+    info_tables_bigquery.loc[info_tables_bigquery.size_stale, 'require_partition_filter'] = pd.NA #not returned by tables().list
+
+    #Tables not fetched keep their last known sizes, still marked with size_stale
+    if df_previous_tables is not None:
+        info_tables_bigquery = carry_previous_sizes(info_tables_bigquery, df_previous_tables)
+
+    print('Inserting data to bigquery')
+    upload_dataframe(info_tables_bigquery, context, gbq_table)
+
+    #Storage billing aggregates by dataset and project of the day, without totals for the projects not covered
+    df_storage_billing = aggregate_storage_billing(info_tables_bigquery, covered_projects)
+    df_storage_billing['log_time'] = log_time #datetime of extraction
+
+    print('Inserting storage billing aggregates to bigquery')
+    upload_dataframe(df_storage_billing, context, gbq_table_storage_billing)
+
+    #Coverage markers of the run, projects not covered are crawled first by the next run
+    df_coverage = build_coverage(list_projects_with_bigquery_api_enabled, covered_projects, gbq_table, date_extraction, log_time)
+
+    print('Inserting crawl coverage to bigquery')
+    upload_dataframe(df_coverage, context, gbq_table_coverage)
@@ -0,0 +1,149 @@
+# Extractor of bigquery_views_analysis: information about all views in organization (snapshot of the day)
+from data_governance.context import upload_dataframe
+from data_governance.deadline import build_coverage, coverage_priority, deadline_reached, get_last_coverage
+from data_governance.projects import list_datasets
+from data_governance.transport import build_service
+
+
+#bigquery informations
+gbq_table = 'bigquery_views_analysis'
+gbq_table_coverage = 'crawl_coverage'
+
+def list_views(project, dataset, credentials):
+    """
+    List all views for a project and dataset in gcp, stopping at the deadline (see deadline_reached).
+
+    Args:
+        project (str): project name on gcp to search for tables
+        dataset (str): dataset name on gcp to search for tables
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        df_info_views (DataFrame): dataframe with views infos, without the views not fetched before the deadline
+
+    """
+    import pandas as pd
+
+    service = build_service('bigquery', 'v2', credentials=credentials)
+    pageToken_list_views=""
+    list_views = []
+
+    df_info_views = pd.DataFrame()
+    df_info_view = pd.DataFrame()
+    while pageToken_list_views is not None:
+
+        rqst = service.tables().list(projectId=project, datasetId=dataset, pageToken=pageToken_list_views)
+        resp = rqst.execute()
+        if 'tables' in resp.keys():
+            for i in range(0,len(resp['tables'])):
+                if resp['tables'][i]['type']=='VIEW':
+                    list_views.append(resp['tables'][i]['tableReference']['tableId'])
+                else: None
+            pageToken_list_views = resp.get('nextPageToken')
+        else:
+            print("There are no views in this dataset.")
+            list_views = []
+            pageToken_list_views = None
+    
+    for view in list_views:
+        if deadline_reached():
+            break
+        print(f"view: {view}")
+
+        rqst = service.tables().get(projectId=project, datasetId=dataset, tableId=view)
+        resp = rqst.execute()
+        df_info_view = pd.json_normalize(resp)
+
+        df_info_views = pd.concat([df_info_views,df_info_view], ignore_index=True)
+    
+    return df_info_views
+
+
+def run(context):
+    """
+    Crawl all views of the projects with the big query API enabled and insert the snapshot of the day
+    and the coverage markers in bigquery.
+
+    Args:
+        context (RunContext): context of the run
+
+    """
+    credentials = context.credentials
+    project_gcp = context.project_gcp
+    dataset_name = context.dataset_name
+    date_extraction = context.date_extraction
+    log_time = context.log_time
+    list_projects_with_bigquery_api_enabled = context.bigquery_projects
+    #pandas is imported only after the first API call, so the first calls of the crawl do not wait for its import
+    import pandas as pd
+
+    #Projects not covered for the longest time are crawled first, so a job stopped by the deadline converges to full coverage
+    last_coverage = get_last_coverage(project_gcp, dataset_name, gbq_table_coverage, gbq_table)
+    project_priority = coverage_priority(list_projects_with_bigquery_api_enabled, last_coverage)
+    list_projects_with_bigquery_api_enabled.sort(key=lambda project: project_priority[project])
+    covered_projects = set()
+
+    #filtering only important columns, you can add more if you want
+    cols_table_filter = ['tableReference.projectId','tableReference.datasetId', 'tableReference.tableId', 'location',
+                        'creationTime', 'lastModifiedTime', 'description','schema.fields','view.query']
+    info_views_bigquery = pd.DataFrame(columns=cols_table_filter)
+
+    #For loop to go inside each project and dataset and list tables
+    for project in list_projects_with_bigquery_api_enabled:
+        if deadline_reached():
+            print(f"Deadline reached, {len(covered_projects)} of {len(list_projects_with_bigquery_api_enabled)} projects covered")
+            break
+        print("Analyzing the project {}".format(project))
+        datasets = list_datasets(project, credentials)
+
+        for dataset in datasets:
+            if deadline_reached():
+                break #project not covered
+            print(f"------------Dataset: {dataset}------------")
+            info_views = list_views(project, dataset, credentials)
+            info_views = info_views.reindex(columns = cols_table_filter) 
+            info_views_bigquery = pd.concat([info_views_bigquery,info_views],ignore_index=True).reset_index(drop = True)
+            if deadline_reached():
+                break #views of the dataset may be partial, project not covered
+        else:
+            covered_projects.add(project)
+
+    info_views_bigquery = info_views_bigquery[cols_table_filter]
+
+    #renaming columns
+    info_views_bigquery.rename(columns = {'tableReference.projectId':'project_id', 
+                                            'tableReference.datasetId':'dataset_id', 
+                                            'tableReference.tableId':'view_id',
+                                            'creationTime':'creation_time', 
+                                            'lastModifiedTime':'last_modified_time',
+                                            'description':'description',
+                                            'schema.fields':'schema_fields',
+                                            'view.query':'query'
+                                            }, inplace=True)
+
+    info_views_bigquery['date_extraction'] = date_extraction  #day of extraction
+    info_views_bigquery['log_time'] = log_time #datetime of extraction
+
+    columns_order = ['date_extraction','project_id','dataset_id', 'view_id', 'creation_time', 
+                'last_modified_time', 'location', 'description','schema_fields','query','log_time']
+                    
+    info_views_bigquery = info_views_bigquery[columns_order]
+
+    #Treating dataframe columns
+    info_views_bigquery.date_extraction = pd.to_datetime(info_views_bigquery['date_extraction'])
+    info_views_bigquery.creation_time = pd.to_datetime(pd.to_numeric(info_views_bigquery['creation_time']), unit='ms')
+    info_views_bigquery.last_modified_time = pd.to_datetime(pd.to_numeric(info_views_bigquery['last_modified_time']), unit='ms')
+
+    #Remove all \r or \n from dataframe
+    info_views_bigquery = info_views_bigquery.replace(r'\n','', regex=True)
+    info_views_bigquery = info_views_bigquery.replace(r'\r','', regex=True)
+    info_views_bigquery['schema_fields'] = '"' + info_views_bigquery.schema_fields.astype(str) + '"'
+
+    print('Inserting data to bigquery')
+    upload_dataframe(info_views_bigquery, context, gbq_table)
+
+    #Coverage markers of the run, projects not covered are crawled first by the next run
+    df_coverage = build_coverage(list_projects_with_bigquery_api_enabled, covered_projects, gbq_table, date_extraction, log_time)
+
+    print('Inserting crawl coverage to bigquery')
+    upload_dataframe(df_coverage, context, gbq_table_coverage)
@@ -0,0 +1,104 @@
+# Command line interface that runs one or more extractors in a single process
+#
+# Only the standard library is imported at startup: pandas and the google clients are imported
+# by the extractors that are run, so the container starts fast and runs only what it needs.
+import argparse
+import os
+import time
+
+
+EXTRACTORS = ['tables', 'views', 'dataplex', 'events']
+#Share of the time budget of each extractor when several run in the same job (tables crawls the most calls)
+EXTRACTOR_BUDGET_WEIGHTS = {'tables': 4, 'views': 2, 'dataplex': 1, 'events': 1}
+
+def build_parser():
+    """
+    Build the parser of the command line arguments, the environment variables are the defaults.
+
+    Returns:
+        parser (argparse.ArgumentParser): parser of the command line
+
+    """
+    parser = argparse.ArgumentParser(prog='data_governance',
+                                     description='Extract the data governance snapshots of BigQuery and Dataplex.')
+    parser.add_argument('extractors', nargs='+', choices=EXTRACTORS,
+                        help='extractors to run, in order: tables (bigquery_tables_analysis), views (bigquery_views_analysis), '
+                             'dataplex (dataplex_assets_analysis) and events (near real-time updates from audit logs)')
+    parser.add_argument('--service-account', default=os.environ.get('SERVICE_ACCOUNT'),
+                        help='service account to impersonate, the application default credentials are used if not set (SERVICE_ACCOUNT)')
+    parser.add_argument('--project-gcp', default=os.environ.get('PROJECT_GCP'),
+                        help='project of the analysis tables (PROJECT_GCP)')
+    parser.add_argument('--dataset', default=os.environ.get('DATASET_NAME'),
+                        help='dataset of the analysis tables (DATASET_NAME)')
+    parser.add_argument('--dataplex-project', default=os.environ.get('DATAPLEX_PROJECT'),
+                        help='project with your dataplex, defaults to --project-gcp (DATAPLEX_PROJECT)')
+    parser.add_argument('--time-budget', type=int, default=os.environ.get('TIME_BUDGET_SECONDS'),
+                        help='time budget of the job in seconds, shared by the extractors by their weight (EXTRACTOR_BUDGET_WEIGHTS), '
+                             '0 to crawl without deadline (TIME_BUDGET_SECONDS)')
+    parser.add_argument('--upload-reserve', type=int, default=os.environ.get('UPLOAD_RESERVE_SECONDS'),
+                        help='seconds reserved at the end of the time budget of each extractor to upload (UPLOAD_RESERVE_SECONDS)')
+    parser.add_argument('--tables-get-mode', choices=['ALWAYS', 'NEVER', 'CHANGED', 'SAMPLE'], default=os.environ.get('TABLES_GET_MODE'),
+                        help='when the tables extractor calls tables().get (TABLES_GET_MODE)')
+    parser.add_argument('--tables-get-sample-fraction', type=float, default=os.environ.get('TABLES_GET_SAMPLE_FRACTION'),
+                        help='fraction of tables to get with --tables-get-mode SAMPLE (TABLES_GET_SAMPLE_FRACTION)')
+    parser.add_argument('--workers', type=int, default=os.environ.get('WORKERS'),
+                        help='parallel workers of the tables extractor, with one pooled bigquery connection each (WORKERS)')
+    parser.add_argument('--subscription', default=os.environ.get('PUBSUB_SUBSCRIPTION'),
+                        help='subscription with the audit log events, required by events (PUBSUB_SUBSCRIPTION)')
+    parser.add_argument('--events-run-forever', action='store_true',
+                        help='keep listening to the subscription instead of stopping when it is empty')
+    return parser
+
+def options(**kwargs):
+    """Return only the options that were set, so the extractors use their own defaults for the others."""
+    return {key: value for key, value in kwargs.items() if value is not None}
+
+def main(argv=None):
+    """
+    Run the extractors of the command line in a single process, sharing credentials, api clients and project discovery.
+
+    Args:
+        argv (list): command line arguments, None to use sys.argv
+
+    """
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not args.project_gcp or not args.dataset:
+        parser.error('--project-gcp and --dataset (or PROJECT_GCP and DATASET_NAME) are required')
+    if 'events' in args.extractors and not args.subscription:
+        parser.error('--subscription (or PUBSUB_SUBSCRIPTION) is required by events')
+
+    from data_governance import deadline, transport
+    from data_governance.auth import get_credentials
+    from data_governance.context import RunContext
+
+    deadline.configure(**options(time_budget_seconds=args.time_budget, upload_reserve_seconds=args.upload_reserve))
+    context = RunContext(get_credentials(args.service_account), args.project_gcp, args.dataset)
+
+    extractors = list(dict.fromkeys(args.extractors)) #each extractor only once, in the order of the command line
+    if 'tables' in extractors or 'views' in extractors:
+        #The discovery of the projects is shared by tables and views, so it runs before the time budget is shared
+        print("################ projects discovery #######################")
+        start = time.time()
+        print(f"{len(context.bigquery_projects)} projects with the big query API enabled, found in {time.time() - start:.0f}s")
+    for position, name in enumerate(extractors):
+        print(f"################ {name} #######################")
+        start = time.time()
+        deadline.start_extractor(EXTRACTOR_BUDGET_WEIGHTS[name], sum(EXTRACTOR_BUDGET_WEIGHTS[other] for other in extractors[position:]))
+        if name == 'tables':
+            from data_governance import bigquery_tables
+            bigquery_tables.run(context, **options(get_mode=args.tables_get_mode, sample_fraction=args.tables_get_sample_fraction,
+                                                   workers=args.workers))
+        elif name == 'views':
+            from data_governance import bigquery_views
+            bigquery_views.run(context)
+        elif name == 'dataplex':
+            from data_governance import dataplex_assets
+            dataplex_assets.run(context, args.dataplex_project or args.project_gcp)
+        elif name == 'events':
+            from data_governance import audit_log_events
+            audit_log_events.run(context, args.subscription, run_forever=args.events_run_forever)
+        print(f"{name} finished in {time.time() - start:.0f}s")
+
+    #Connection reuse of google api clients
+    transport.print_http_pool_metrics()
@@ -0,0 +1,73 @@
+# State shared by the extractors of one run and upload of the snapshots
+import json
+import os
+from datetime import datetime
+
+from data_governance.projects import list_projects_with_bigquery_api_enabled
+
+
+SCHEMAS_DIR = os.path.join(os.path.dirname(__file__), 'schemas')
+
+class RunContext(object):
+    """
+    Credentials, destination and project discovery shared by the extractors of one run.
+
+    All extractors of a run write the same date_extraction and log_time, and the projects with
+    the big query API enabled are discovered only once.
+
+    Args:
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+        project_gcp (str): project of the analysis tables
+        dataset_name (str): dataset of the analysis tables
+
+    """
+
+    def __init__(self, credentials, project_gcp, dataset_name):
+        self.credentials = credentials
+        self.project_gcp = project_gcp
+        self.dataset_name = dataset_name
+        self.date_extraction = datetime.today().date() #day of extraction
+        self.log_time = datetime.today() #datetime of extraction
+        self._bigquery_projects = None
+
+    @property
+    def bigquery_projects(self):
+        """List of projects with the big query API enabled, discovered in the first use."""
+        if self._bigquery_projects is None:
+            self._bigquery_projects = list_projects_with_bigquery_api_enabled(self.credentials)
+        return list(self._bigquery_projects)
+
+def load_table_schema(gbq_table):
+    """
+    Load the schema of an analysis table.
+
+    Args:
+        gbq_table (str): name of the analysis table
+
+    Returns:
+        table_schema (list): list of fields of the table
+
+    """
+    with open(os.path.join(SCHEMAS_DIR, f"{gbq_table}.json")) as table_schema_json:
+        return json.load(table_schema_json)
+
+def upload_dataframe(df, context, gbq_table, table_schema=None, if_exists='append'):
+    """
+    Insert a dataframe in an analysis table.
+
+    Args:
+        df (DataFrame): dataframe to insert
+        context (RunContext): context of the run
+        gbq_table (str): name of the analysis table
+        table_schema (list): schema of the table, None to load it from the schemas of the package
+        if_exists (str): append or replace
+
+    """
+    if table_schema is None:
+        table_schema = load_table_schema(gbq_table)
+
+    df.to_gbq(destination_table = context.dataset_name+"."+gbq_table,
+              project_id = context.project_gcp,
+              if_exists=if_exists,
+              chunksize=1000000,
+              table_schema=table_schema)
@@ -0,0 +1,130 @@
+# Time budget of the run and coverage markers of the projects crawled
+import time
+
+
+#Time budget of the job in seconds (ex: the task timeout of the Cloud Run Job), 0 to crawl without deadline
+TIME_BUDGET_SECONDS = 0
+#Seconds reserved at the end of the time budget to treat and upload what was crawled
+UPLOAD_RESERVE_SECONDS = 300
+job_start_time = time.time()
+extractor_end_time = None #end of the share of the time budget of the extractor running, None for the whole budget
+
+def configure(time_budget_seconds=TIME_BUDGET_SECONDS, upload_reserve_seconds=UPLOAD_RESERVE_SECONDS):
+    """
+    Set the time budget of the run, shared by all extractors.
+
+    Args:
+        time_budget_seconds (int): time budget of the job in seconds, 0 to crawl without deadline
+        upload_reserve_seconds (int): seconds reserved at the end of the time budget to treat and upload
+
+    """
+    global TIME_BUDGET_SECONDS, UPLOAD_RESERVE_SECONDS
+    TIME_BUDGET_SECONDS = time_budget_seconds
+    UPLOAD_RESERVE_SECONDS = upload_reserve_seconds
+
+def start_extractor(weight=1, remaining_weight=1):
+    """
+    Give the extractor that starts a share of the time left of the budget, so the extractors run after it
+    in the same job still have time to crawl.
+
+    The share is proportional to the weight of the extractor among the extractors not run yet, the time
+    not used by an extractor is shared by the next ones.
+
+    Args:
+        weight (int): weight of the extractor that starts
+        remaining_weight (int): sum of the weights of this extractor and of the extractors run after it
+
+    """
+    global extractor_end_time
+    if TIME_BUDGET_SECONDS <= 0:
+        return
+    time_left = job_start_time + TIME_BUDGET_SECONDS - time.time()
+    extractor_end_time = time.time() + max(0, time_left) * weight / remaining_weight
+
+def deadline_reached():
+    """
+    Check if the crawl must stop taking new work to upload what it has inside its time budget.
+
+    Returns:
+        deadline_reached (bool): True if the time left of the extractor (or of the job) is only the upload reserve
+
+    """
+    if TIME_BUDGET_SECONDS <= 0:
+        return False
+    end_time = extractor_end_time if extractor_end_time is not None else job_start_time + TIME_BUDGET_SECONDS
+    return time.time() > end_time - UPLOAD_RESERVE_SECONDS
+
+def get_last_coverage(project_gcp, dataset_name, gbq_table_coverage, extractor):
+    """
+    Get the last day that each project was fully crawled by an extractor.
+
+    Args:
+        project_gcp (str): project of the coverage table
+        dataset_name (str): dataset of the coverage table
+        gbq_table_coverage (str): name of the coverage table
+        extractor (str): name of the extractor (its analysis table)
+
+    Returns:
+        last_coverage (dict): last covered date by project, None if the project was never fully crawled
+
+    """
+    import pandas as pd
+
+    query = f"""
+        SELECT project_id, MAX(IF(covered, date_extraction, NULL)) AS last_covered
+        FROM `{project_gcp}.{dataset_name}.{gbq_table_coverage}`
+        WHERE extractor = '{extractor}'
+        GROUP BY project_id
+    """
+    try:
+        df_coverage = pd.read_gbq(query, project_id=project_gcp)
+    except Exception as e:
+        print(f"Could not read the crawl coverage, crawling without coverage priority: {e}")
+        return {}
+
+    return {row.project_id: None if pd.isnull(row.last_covered) else pd.Timestamp(row.last_covered)
+            for row in df_coverage.itertuples(index=False)}
+
+def coverage_priority(projects, last_coverage):
+    """
+    Rank projects to crawl first the ones not covered for the longest time (never covered first).
+
+    Args:
+        projects (list): list of projects
+        last_coverage (dict): last covered date by project
+
+    Returns:
+        priority (dict): rank by project, lower is crawled first
+
+    """
+    import pandas as pd
+
+    def last_covered(project):
+        return last_coverage.get(project) or pd.Timestamp.min
+
+    ranks = {value: rank for rank, value in enumerate(sorted(set(last_covered(project) for project in projects)))}
+    return {project: ranks[last_covered(project)] for project in projects}
+
+def build_coverage(projects, covered_projects, extractor, date_extraction, log_time):
+    """
+    Build the coverage markers of a run.
+
+    Args:
+        projects (list): list of projects that should be crawled
+        covered_projects (set): projects fully crawled before the deadline
+        extractor (str): name of the extractor (its analysis table)
+        date_extraction (date): day of extraction
+        log_time (datetime): datetime of extraction
+
+    Returns:
+        df_coverage (DataFrame): dataframe with one coverage marker by project
+
+    """
+    import pandas as pd
+
+    df_coverage = pd.DataFrame({'project_id': list(projects)})
+    df_coverage['date_extraction'] = pd.to_datetime(date_extraction)
+    df_coverage['extractor'] = extractor
+    df_coverage['covered'] = df_coverage.project_id.isin(covered_projects)
+    df_coverage['log_time'] = log_time
+    return df_coverage[['date_extraction', 'extractor', 'project_id', 'covered', 'log_time']]
@@ -0,0 +1,133 @@
+# Discovery of projects and datasets shared by the extractors
+import time
+
+from data_governance.deadline import deadline_reached
+from data_governance.transport import build_service
+
+
+def list_all_projects_gcp(credentials):
+    """
+    List all projects in gcp.
+
+    Args:
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        list_all_projects (str): list of projects
+
+    """
+    
+    service = build_service('cloudresourcemanager', 'v1', credentials=credentials)
+    list_all_projects = []
+
+    pageToken=""
+    while pageToken is not None:
+        request = service.projects().list(filter="lifecycleState:ACTIVE", pageToken=pageToken)
+        resp_list_projects = request.execute()
+        #listando os projetos da gcp
+        for i in range(0, len(resp_list_projects["projects"])):
+            list_all_projects.append(resp_list_projects["projects"][i]["projectId"])
+        
+        pageToken = resp_list_projects.get('nextPageToken')
+    
+    return list_all_projects
+
+def list_projects_with_bigquery_api_enabled(credentials):
+    """
+    List all active projects in gcp that have the big query API enabled, stopping at the deadline (see deadline_reached).
+
+    Args:
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        list_projects_with_bigquery_api_enabled (list): list of projects, without the projects not checked before the deadline
+
+    """
+    list_projects_with_bigquery_api_enabled = []
+
+    #List all project of gcp
+    list_all_projects = list_all_projects_gcp(credentials=credentials)
+
+    #Remove project from appscript,appsheets and etc that starts with "sys-"
+    list_all_projects = [x for x in list_all_projects if not x.startswith('sys-')]
+
+    #Filtering only project that has big query API enabled
+    service = build_service('serviceusage', 'v1', credentials=credentials)
+    print('Filtering only project that has big query API enabled')
+    for position, project in enumerate(list_all_projects):
+        if deadline_reached():
+            print(f"Deadline reached, {position} of {len(list_all_projects)} projects checked")
+            break
+        pageToken=""
+        while pageToken is not None:
+            request = service.services().list(parent="projects/{}".format(project), filter = "state:ENABLED", fields='services/config/name,nextPageToken', pageToken=pageToken, pageSize=200)
+            resp = request.execute()
+            pageToken = resp.get('nextPageToken')
+            time.sleep(0.3)
+            if resp == {}: #jump if response is empty
+                continue
+            for i in range(0,len(resp['services'])):
+                if "bigquery.googleapis.com" in resp['services'][i]['config']['name']: #check if exists big query api enabled, if yes, so append it
+                    list_projects_with_bigquery_api_enabled.append(project)
+                else:
+                    None
+
+    #remove duplicates if has
+    return list(set(list_projects_with_bigquery_api_enabled))
+
+def list_datasets(project, credentials):
+
+    """
+    List all datasets in a project in gcp.
+
+    Args:
+        project (str): project name on gcp to search for datasets
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        list_datasets (list): list of datasets
+
+    """
+
+    service = build_service('bigquery', 'v2', credentials=credentials)
+    pageToken=""
+    list_datasets = []
+    while pageToken is not None:
+
+        rqst = service.datasets().list(projectId=project, pageToken=pageToken)
+        resp = rqst.execute()
+        if not 'datasets' in resp:
+            list_datasets=[]
+        else:
+            for i in range(0,len(resp['datasets'])):
+                list_datasets.append(resp['datasets'][i]['datasetReference']['datasetId'])
+        pageToken = resp.get('nextPageToken')
+    
+    return list_datasets
+
+def list_datasets_locations(project, credentials):
+
+    """
+    List all datasets in a project in gcp with their locations.
+
+    Args:
+        project (str): project name on gcp to search for datasets
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        datasets_locations (dict): location by dataset
+
+    """
+
+    service = build_service('bigquery', 'v2', credentials=credentials)
+    pageToken=""
+    datasets_locations = {}
+    while pageToken is not None:
+
+        rqst = service.datasets().list(projectId=project, pageToken=pageToken)
+        resp = rqst.execute()
+        for dataset in resp.get('datasets', []):
+            datasets_locations[dataset['datasetReference']['datasetId']] = dataset.get('location')
+        pageToken = resp.get('nextPageToken')
+
+    return datasets_locations
@@ -0,0 +1,178 @@
+# Pooled keep-alive transport shared by all google api clients
+import queue
+import threading
+from urllib.parse import urlsplit
+
+
+#Pool sizes of persistent connections by API host, hosts not listed use HTTP_POOL_DEFAULT_SIZE
+HTTP_POOL_DEFAULT_SIZE = 2
+HTTP_POOL_SIZES = {'cloudresourcemanager.googleapis.com': 1,
+                   'serviceusage.googleapis.com': 1,
+                   'bigquery.googleapis.com': 4,
+                   'dataplex.googleapis.com': 2}
+HTTP_TIMEOUT_SECONDS = 60
+
+
+class PooledHttp(object):
+    """
+    Transport compatible with httplib2.Http that keeps a pool of keep-alive connections by API host.
+
+    Each pooled httplib2.Http only talks to one host, so the TLS connection it holds is reused
+    by the next request to the same host instead of being opened again. The connections are
+    counted when they are really opened (connect), so a socket closed by the server and
+    opened again by httplib2 is not counted as reused.
+
+    Args:
+        pool_sizes (dict): max number of persistent connections by host
+        default_pool_size (int): max number of persistent connections for hosts not in pool_sizes
+        timeout (int): socket timeout in seconds
+
+    """
+
+    def __init__(self, pool_sizes=None, default_pool_size=HTTP_POOL_DEFAULT_SIZE, timeout=HTTP_TIMEOUT_SECONDS):
+        self.pool_sizes = pool_sizes or {}
+        self.default_pool_size = default_pool_size
+        self.timeout = timeout
+        self.follow_redirects = True
+        self.redirect_codes = frozenset((300, 301, 302, 303, 307)) #httplib2 redirect codes without 308, same as googleapiclient.http.build_http
+        self._lock = threading.Lock()
+        self._pools = {}
+        self._created = {}
+        self._metrics = {}
+        self._local = threading.local() #connections opened by the request of each thread
+        self._connection_types = None
+
+    def set_pool_size(self, host, size):
+        """
+        Set the max number of persistent connections of a host (ex: one by worker of an extractor).
+
+        Args:
+            host (str): API host
+            size (int): max number of persistent connections
+
+        """
+        with self._lock:
+            self.pool_sizes[host] = size
+
+    def _connection_type(self, uri):
+        import httplib2
+
+        if self._connection_types is None:
+            local = self._local
+
+            def counting(connection_type):
+                class CountingConnection(connection_type):
+                    def connect(self):
+                        local.connects += 1
+                        return super().connect()
+                return CountingConnection
+
+            self._connection_types = {scheme: counting(connection_type) for scheme, connection_type in httplib2.SCHEME_TO_CONNECTION.items()}
+        return self._connection_types[urlsplit(uri).scheme]
+
+    def _acquire(self, host):
+        import httplib2
+
+        with self._lock:
+            if host not in self._pools:
+                self._pools[host] = queue.LifoQueue() #LIFO to always reuse the warmest connection
+                self._created[host] = 0
+                self._metrics[host] = {'requests': 0, 'reused': 0, 'new': 0}
+            pool = self._pools[host]
+            try:
+                return pool.get_nowait()
+            except queue.Empty:
+                if self._created[host] < self.pool_sizes.get(host, self.default_pool_size):
+                    self._created[host] += 1
+                    http = httplib2.Http(timeout=self.timeout)
+                    http.follow_redirects = self.follow_redirects
+                    http.redirect_codes = self.redirect_codes
+                    return http
+        return pool.get() #wait until other request release a connection
+
+    def request(self, uri, method='GET', body=None, headers=None, redirections=5, connection_type=None):
+        host = urlsplit(uri).netloc
+        http = self._acquire(host)
+        self._local.connects = 0
+        try:
+            return http.request(uri, method=method, body=body, headers=headers,
+                                redirections=redirections, connection_type=connection_type or self._connection_type(uri))
+        finally:
+            #the request reused a connection only if httplib2 did not open one (new or to replace a closed socket)
+            with self._lock:
+                self._metrics[host]['requests'] += 1
+                self._metrics[host]['new' if self._local.connects > 0 else 'reused'] += 1
+            self._pools[host].put(http)
+
+    @property
+    def connections(self):
+        with self._lock:
+            return {host: sum(len(http.connections) for http in pool.queue) for host, pool in self._pools.items()}
+
+    def metrics(self):
+        """
+        Return the connection reuse metrics by host.
+
+        Returns:
+            metrics (dict): requests, reused and new connections and reuse rate by host
+
+        """
+        with self._lock:
+            metrics = {}
+            for host, values in self._metrics.items():
+                metrics[host] = dict(values)
+                metrics[host]['reuse_rate'] = values['reused'] / values['requests'] if values['requests'] else 0.0
+            return metrics
+
+    def close(self):
+        with self._lock:
+            for pool in self._pools.values():
+                for http in pool.queue:
+                    http.close()
+
+
+http_pool = PooledHttp(pool_sizes=dict(HTTP_POOL_SIZES))
+services = {}
+services_lock = threading.Lock()
+
+def build_service(api, version, credentials):
+    """
+    Return a google api client that uses the shared pooled transport, built only once by api and credentials.
+
+    Args:
+        api (str): name of google api (ex: bigquery)
+        version (str): version of google api (ex: v2)
+        credentials (google.oauth2.credentials.Credentials): the credentials of account to use to access api.
+
+    Returns:
+        service (googleapiclient.discovery.Resource): google api client
+
+    """
+    import google_auth_httplib2
+    from googleapiclient import discovery
+
+    key = (api, version, id(credentials))
+    with services_lock:
+        if key not in services:
+            http = google_auth_httplib2.AuthorizedHttp(credentials, http=http_pool)
+            services[key] = discovery.build(api, version, http=http, cache_discovery=False)
+        return services[key]
+
+def set_pool_size(host, size):
+    """
+    Set the max number of persistent connections of a host in the shared pooled transport.
+
+    Args:
+        host (str): API host (ex: bigquery.googleapis.com)
+        size (int): max number of persistent connections
+
+    """
+    http_pool.set_pool_size(host, size)
+
+def print_http_pool_metrics():
+    """
+    Print the connection reuse rate by API host of the shared pooled transport.
+    """
+    for host, values in http_pool.metrics().items():
+        print(f"{host}: {values['requests']} requests, {values['new']} new connections, "
+              f"{values['reused']} reused ({values['reuse_rate']:.1%})")
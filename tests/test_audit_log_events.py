@@ -0,0 +1,268 @@
+"""Tests of the events extractor, fed by an in-process queue (or the Pub/Sub emulator with PUBSUB_EMULATOR_HOST)."""
+import json
+import os
+import queue
+import uuid
+from types import SimpleNamespace
+
+import httplib2
+import pandas as pd
+import pytest
+from google.cloud.bigquery import _pandas_helpers
+from googleapiclient.errors import HttpError
+
+from data_governance import audit_log_events
+
+
+PROJECT_GCP = 'governance-project'
+DATASET_NAME = 'governance'
+SUBSCRIPTION = 'projects/governance-project/subscriptions/inventory-events'
+LAST_SNAPSHOT = pd.Timestamp('2026-10-18')
+
+
+def table_entry(method, resource_name):
+    return {'protoPayload': {'serviceName': 'bigquery.googleapis.com', 'methodName': method, 'resourceName': resource_name}}
+
+def asset_entry(method, resource_name, asset_id=None):
+    payload = {'serviceName': 'dataplex.googleapis.com', 'methodName': method, 'resourceName': resource_name}
+    if asset_id:
+        payload['request'] = {'assetId': asset_id}
+    return {'protoPayload': payload}
+
+def not_found():
+    return HttpError(httplib2.Response({'status': 404}), b'not found')
+
+def forbidden():
+    return HttpError(httplib2.Response({'status': 403}), b'forbidden')
+
+
+class Request(object):
+    def __init__(self, result):
+        self.result = result
+
+    def execute(self):
+        if isinstance(self.result, Exception):
+            raise self.result
+        return self.result
+
+class FakeBigQueryService(object):
+    """tables().get and datasets().get of the bigquery v2 api, resources are responses or HttpError."""
+
+    def __init__(self, tables, datasets):
+        self._tables = tables
+        self._datasets = datasets
+        self.tables_get = []
+
+    def tables(self):
+        return self
+
+    def datasets(self):
+        return SimpleNamespace(get=lambda projectId, datasetId: Request(self._datasets.get((projectId, datasetId), {})))
+
+    def get(self, projectId, datasetId, tableId):
+        self.tables_get.append((projectId, datasetId, tableId))
+        return Request(self._tables.get((projectId, datasetId, tableId), not_found()))
+
+class FakeDataplexService(object):
+    """projects().locations().lakes().zones().assets().get of the dataplex v1 api."""
+
+    def __init__(self, assets):
+        self._assets = assets
+
+    def projects(self):
+        return self
+    locations = lakes = zones = assets = projects
+
+    def get(self, name):
+        return Request(self._assets.get(name, not_found()))
+
+class FakeBigQueryClient(object):
+    """
+    bigquery.Client that records the staging loads (of all batches) and the queries of the upserts.
+
+    The loads are converted to Arrow with the schema of the job, like load_table_from_dataframe does.
+    """
+
+    def __init__(self):
+        self.loads = {}
+        self.queries = []
+
+    def query(self, sql):
+        self.queries.append(sql)
+        return SimpleNamespace(to_dataframe=lambda: pd.DataFrame({'date_extraction': [LAST_SNAPSHOT.date()]}),
+                               result=lambda: None)
+
+    def load_table_from_dataframe(self, df, destination, job_config=None):
+        _pandas_helpers.dataframe_to_arrow(df, job_config.schema)
+        self.loads.setdefault(destination.split('.')[-1], []).append(df)
+        return SimpleNamespace(result=lambda: None)
+
+class FailingBigQueryClient(FakeBigQueryClient):
+    def load_table_from_dataframe(self, df, destination, job_config=None):
+        raise RuntimeError('load failed')
+
+class QueueSubscriber(object):
+    """In-process stand-in of pubsub_v1.SubscriberClient: pull from a queue.Queue and record the acks."""
+
+    def __init__(self):
+        self.messages = queue.Queue()
+        self.acked = []
+
+    def publish(self, data):
+        message_id = str(uuid.uuid4())
+        self.messages.put(SimpleNamespace(ack_id=f"ack-{message_id}", message=SimpleNamespace(data=data, message_id=message_id)))
+
+    def pull(self, request):
+        received_messages = []
+        while len(received_messages) < request['max_messages'] and not self.messages.empty():
+            received_messages.append(self.messages.get())
+        return SimpleNamespace(received_messages=received_messages)
+
+    def acknowledge(self, request):
+        self.acked.extend(request['ack_ids'])
+
+
+@pytest.fixture
+def services(monkeypatch):
+    bigquery = FakeBigQueryService(
+        tables={('p1', 'sales', 'orders'): {'type': 'TABLE', 'location': 'US', 'creationTime': '1760000000000',
+                                            'lastModifiedTime': '1760000000000', 'numRows': '10', 'numBytes': '100',
+                                            'tableReference': {'projectId': 'p1', 'datasetId': 'sales', 'tableId': 'orders'}},
+                ('p1', 'sales', 'orders_view'): {'type': 'VIEW', 'location': 'US', 'creationTime': '1760000000000',
+                                                 'view': {'query': 'SELECT *\nFROM orders'},
+                                                 'tableReference': {'projectId': 'p1', 'datasetId': 'sales', 'tableId': 'orders_view'}},
+                ('p2', 'secret', 'salaries'): forbidden()},
+        datasets={('p1', 'staging'): not_found()})
+    dataplex = FakeDataplexService(
+        assets={'projects/p1/locations/us/lakes/lake/zones/raw/assets/sales':
+                    {'name': 'projects/p1/locations/us/lakes/lake/zones/raw/assets/sales', 'state': 'ACTIVE',
+                     'createTime': '2026-10-18T10:00:00Z', 'resourceSpec': {'name': 'projects/p1/datasets/sales', 'type': 'BIGQUERY_DATASET'}}})
+    apis = {'bigquery': bigquery, 'dataplex': dataplex}
+    monkeypatch.setattr(audit_log_events, 'build_service', lambda api, version, credentials: apis[api])
+    return apis
+
+@pytest.fixture
+def context():
+    return SimpleNamespace(credentials=None, project_gcp=PROJECT_GCP, dataset_name=DATASET_NAME)
+
+def publish_sample_events(publish):
+    entries = [table_entry('google.cloud.bigquery.v2.JobService.InsertJob', 'projects/p1/datasets/sales/tables/orders'),
+               table_entry('google.cloud.bigquery.v2.TableService.PatchTable', 'projects/p1/datasets/sales/tables/orders'),
+               table_entry('google.cloud.bigquery.v2.TableService.InsertTable', 'projects/p1/datasets/sales/tables/orders_view'),
+               table_entry('google.cloud.bigquery.v2.TableService.DeleteTable', 'projects/p1/datasets/sales/tables/old_orders'),
+               table_entry('google.cloud.bigquery.v2.TableService.UpdateTable', 'projects/p2/datasets/secret/tables/salaries'),
+               table_entry('google.cloud.bigquery.v2.DatasetService.DeleteDataset', 'projects/p1/datasets/staging'),
+               table_entry('google.cloud.bigquery.v2.TableService.DeleteTable', 'projects/p1/datasets/staging/tables/tmp'),
+               asset_entry('google.cloud.dataplex.v1.DataplexService.CreateAsset', 'projects/p1/locations/us/lakes/lake/zones/raw', 'sales'),
+               asset_entry('google.cloud.dataplex.v1.DataplexService.DeleteAsset', 'projects/p1/locations/us/lakes/lake/zones/raw/assets/old')]
+    for entry in entries:
+        publish(json.dumps(entry).encode('utf-8'))
+    publish(b'not a LogEntry')
+    return len(entries) + 1
+
+def check_upserts(services, client):
+    def loaded(staging_table):
+        return pd.concat(client.loads[staging_table])
+
+    tables = loaded('bigquery_tables_analysis_events').set_index('table_id')
+    assert set(tables.index) == {'orders', 'old_orders'}
+    assert not tables.loc['orders', 'deleted'] and tables.loc['orders', 'num_bytes'] == 100
+    assert tables.loc['old_orders', 'deleted']
+    assert (tables.date_extraction == LAST_SNAPSHOT.date()).all()
+
+    views = loaded('bigquery_views_analysis_events').set_index('view_id')
+    assert set(views.index) == {'orders_view', 'old_orders'}
+    assert not views.loc['orders_view', 'deleted'] and views.loc['orders_view', 'query'] == 'SELECT *FROM orders'
+
+    assets = loaded('dataplex_assets_analysis_events').set_index('name_asset')
+    assert set(assets.index) == {'sales', 'old'}
+    assert not assets.loc['sales', 'deleted'] and assets.loc['old', 'deleted']
+
+    #the table forbidden is skipped, the tables of the deleted dataset are deleted with it
+    assert ('p2', 'secret', 'salaries') in services['bigquery'].tables_get
+    assert ('p1', 'staging', 'tmp') not in services['bigquery'].tables_get
+    deletes = [sql for sql in client.queries if 'DELETE FROM' in sql]
+    assert len(deletes) == 2 and all("(project_id = 'p1' AND dataset_id = 'staging')" in sql for sql in deletes)
+    assert len([sql for sql in client.queries if 'MERGE' in sql]) == sum(len(loads) for loads in client.loads.values())
+
+
+def test_parse_audit_log_event():
+    assert audit_log_events.parse_audit_log_event(
+        table_entry('google.cloud.bigquery.v2.JobService.InsertJob', 'projects/p1/datasets/sales/tables/orders$20261018')
+    ) == ('TABLE', 'create', ('p1', 'sales', 'orders'))
+    assert audit_log_events.parse_audit_log_event(
+        table_entry('google.cloud.bigquery.v2.DatasetService.DeleteDataset', 'projects/p1/datasets/sales')
+    ) == ('DATASET', 'delete', ('p1', 'sales'))
+    assert audit_log_events.parse_audit_log_event(
+        table_entry('google.cloud.bigquery.v2.DatasetService.InsertDataset', 'projects/p1/datasets/sales')) is None
+    assert audit_log_events.parse_audit_log_event(
+        asset_entry('google.cloud.dataplex.v1.DataplexService.CreateAsset', 'projects/p1/locations/us/lakes/lake/zones/raw', 'sales')
+    ) == ('ASSET', 'create', 'projects/p1/locations/us/lakes/lake/zones/raw/assets/sales')
+    assert audit_log_events.parse_audit_log_event({'protoPayload': 'not a payload'}) is None
+
+def test_run_from_in_process_queue(services, context):
+    subscriber = QueueSubscriber()
+    client = FakeBigQueryClient()
+    published = publish_sample_events(subscriber.publish)
+
+    audit_log_events.run(context, SUBSCRIPTION, subscriber=subscriber, client=client, max_messages=4)
+
+    assert subscriber.messages.empty()
+    assert len(subscriber.acked) == published
+    check_upserts(services, client)
+
+def test_run_delete_only_batch(services, context):
+    subscriber = QueueSubscriber()
+    client = FakeBigQueryClient()
+    subscriber.publish(json.dumps(table_entry('google.cloud.bigquery.v2.TableService.DeleteTable',
+                                              'projects/p1/datasets/sales/tables/old_orders')).encode('utf-8'))
+
+    audit_log_events.run(context, SUBSCRIPTION, subscriber=subscriber, client=client)
+
+    assert len(subscriber.acked) == 1
+    tables = pd.concat(client.loads['bigquery_tables_analysis_events'])
+    assert tables.deleted.tolist() == [True] and tables.creation_time.isna().all()
+
+def test_run_does_not_ack_when_upsert_fails(services, context):
+    subscriber = QueueSubscriber()
+    client = FailingBigQueryClient()
+    publish_sample_events(subscriber.publish)
+
+    with pytest.raises(RuntimeError):
+        audit_log_events.run(context, SUBSCRIPTION, subscriber=subscriber, client=client)
+    assert subscriber.acked == []
+
+def test_run_stops_at_deadline(services, context, monkeypatch):
+    subscriber = QueueSubscriber()
+    client = FakeBigQueryClient()
+    published = publish_sample_events(subscriber.publish)
+    batches = iter([False, True])
+    monkeypatch.setattr(audit_log_events, 'deadline_reached', lambda: next(batches))
+
+    audit_log_events.run(context, SUBSCRIPTION, subscriber=subscriber, client=client, max_messages=4, run_forever=True)
+
+    assert len(subscriber.acked) == 4
+    assert subscriber.messages.qsize() == published - 4
+
+@pytest.mark.skipif(not os.environ.get('PUBSUB_EMULATOR_HOST'), reason='PUBSUB_EMULATOR_HOST is not set')
+def test_run_from_pubsub_emulator(services, context):
+    pubsub_v1 = pytest.importorskip('google.cloud.pubsub_v1')
+
+    publisher = pubsub_v1.PublisherClient()
+    subscriber = pubsub_v1.SubscriberClient()
+    topic = publisher.topic_path(PROJECT_GCP, f"inventory-events-{uuid.uuid4().hex}")
+    subscription = subscriber.subscription_path(PROJECT_GCP, f"inventory-events-{uuid.uuid4().hex}")
+    publisher.create_topic(request={'name': topic})
+    subscriber.create_subscription(request={'name': subscription, 'topic': topic})
+    try:
+        publish_sample_events(lambda data: publisher.publish(topic, data).result())
+        client = FakeBigQueryClient()
+
+        audit_log_events.run(context, subscription, subscriber=subscriber, client=client)
+
+        check_upserts(services, client)
+        response = subscriber.pull(request={'subscription': subscription, 'max_messages': 10}, timeout=5)
+        assert list(response.received_messages) == []
+    finally:
+        subscriber.delete_subscription(request={'subscription': subscription})
+        publisher.delete_topic(request={'topic': topic})
@@ -0,0 +1,181 @@
+"""Tests of the work units, the table item cache, the get modes and the sizes of the tables extractor, without api calls."""
+import pandas as pd
+import pytest
+
+from data_governance import bigquery_tables
+from data_governance.bigquery_tables import WorkUnit
+
+
+def unit_range(unit, num_tables):
+    """Range of tables of a work unit, same as crawl_work_unit."""
+    return range(num_tables * unit.part // unit.parts, num_tables * (unit.part + 1) // unit.parts)
+
+def table_item(project, dataset, table_id):
+    return {'type': 'TABLE', 'creationTime': '1760000000000',
+            'tableReference': {'projectId': project, 'datasetId': dataset, 'tableId': table_id}}
+
+
+@pytest.mark.parametrize('num_tables,parts', [(1000, 1), (1000, 3), (451, 2), (199, 1), (1, 4), (0, 2)])
+def test_split_work_unit_covers_the_range_once(num_tables, parts):
+    for part in range(parts):
+        unit = WorkUnit(num_tables / parts, 'p', 'd', 'US', part, parts)
+        expected = list(unit_range(unit, num_tables))
+
+        split_units = bigquery_tables.split_work_unit(unit, len(expected), tables_per_unit=200)
+
+        covered = [index for split_unit in split_units for index in unit_range(split_unit, num_tables)]
+        assert covered == expected
+        assert all(len(unit_range(split_unit, num_tables)) <= 200 for split_unit in split_units)
+
+def test_split_work_unit_keeps_small_units():
+    unit = WorkUnit(150, 'p', 'd', 'US', 0, 1)
+    assert bigquery_tables.split_work_unit(unit, 150, tables_per_unit=200) == [unit]
+
+def test_build_work_units_longest_first():
+    datasets_by_project = {'p1': {'small': 'US', 'large': 'EU', 'new': 'US'}, 'p2': {'medium': 'US'}}
+    table_counts = {('p1', 'small'): 10, ('p1', 'large'): 500, ('p2', 'medium'): 150}
+
+    work_units = bigquery_tables.build_work_units(datasets_by_project, table_counts, tables_per_unit=200)
+
+    #datasets not in the previous snapshots are estimated with the mean by dataset (660 / 3 = 220 tables, 2 units)
+    assert [(unit.dataset, unit.part, unit.parts) for unit in work_units] == [
+        ('large', 0, 3), ('large', 1, 3), ('large', 2, 3), ('medium', 0, 1), ('new', 0, 2), ('new', 1, 2), ('small', 0, 1)]
+    assert work_units[4].estimated_tables == pytest.approx(110)
+    estimated = [unit.estimated_tables for unit in work_units]
+    assert estimated == sorted(estimated, reverse=True)
+
+def test_build_work_units_by_project_priority():
+    datasets_by_project = {'covered': {'large': 'US'}, 'not_covered': {'small': 'US'}}
+    table_counts = {('covered', 'large'): 100, ('not_covered', 'small'): 10}
+
+    work_units = bigquery_tables.build_work_units(datasets_by_project, table_counts,
+                                                  project_priority={'not_covered': 0, 'covered': 1})
+
+    assert [unit.project for unit in work_units] == ['not_covered', 'covered']
+
+def test_expected_crawl_seconds():
+    work_units = [WorkUnit(tables, 'p', 'd', 'US', 0, 1) for tables in [4, 3, 3, 2, 2, 2]]
+
+    #the next unit goes to the first free worker: [4, 3] -> [4, 6] -> [6, 6] -> [6, 8] -> [8, 8]
+    assert bigquery_tables.expected_crawl_seconds(work_units, workers=2, seconds_per_table=1) == 8
+    assert bigquery_tables.expected_crawl_seconds(work_units, workers=1, seconds_per_table=0.5) == 8
+
+@pytest.mark.parametrize('estimated_tables,num_tables', [(100, 450), (1000, 450), (450, 0)])
+def test_crawl_work_unit_lists_each_dataset_once_and_empties_the_cache(monkeypatch, estimated_tables, num_tables):
+    listed = []
+    def list_table_items(project, dataset, credentials):
+        listed.append((project, dataset))
+        return [table_item(project, dataset, f"t{index}") for index in range(num_tables)]
+    monkeypatch.setattr(bigquery_tables, 'list_table_items', list_table_items)
+    monkeypatch.setattr(bigquery_tables, 'get_tables',
+                        lambda project, dataset, table_ids, credentials: pd.DataFrame({'tableReference.tableId': table_ids}))
+
+    work_units = bigquery_tables.build_work_units({'p': {'d': 'US'}}, {('p', 'd'): estimated_tables})
+    crawled = []
+    while work_units:
+        df_info_tables, split_units, complete = bigquery_tables.crawl_work_unit(work_units.pop(0), credentials=None)
+        assert complete
+        crawled.extend(df_info_tables['tableReference.tableId'])
+        work_units.extend(split_units)
+
+    assert sorted(crawled) == sorted(f"t{index}" for index in range(num_tables))
+    assert listed == [('p', 'd')]
+    assert bigquery_tables.table_items_cache == {}
+    assert bigquery_tables.table_items_remaining == {}
+    assert bigquery_tables.table_items_locks == {}
+
+def treated_tables(rows):
+    """Tables infos after the columns treatment of bigquery_tables.run, sizes not given are null."""
+    df = pd.DataFrame(rows)
+    df['date_extraction'] = pd.Timestamp('2026-10-19')
+    df['creation_time'] = pd.Timestamp('2025-10-09')
+    df['size_stale'] = df['size_stale'].fillna(False).astype(bool) if 'size_stale' in df else False
+    for column in bigquery_tables.SIZE_COLUMNS:
+        df[column] = pd.array(df[column] if column in df else [None] * len(df), dtype='Int64')
+    return df
+
+def test_aggregate_storage_billing():
+    gib = bigquery_tables.GIB
+    df_tables = treated_tables([
+        {'project_id': 'p1', 'dataset_id': 'sales', 'table_id': 'orders', 'num_rows': 10, 'num_total_logical_bytes': 3 * gib,
+         'num_active_logical_bytes': 2 * gib, 'num_long_term_logical_bytes': gib, 'num_active_physical_bytes': gib,
+         'num_long_term_physical_bytes': 0, 'num_time_travel_physical_bytes': gib},
+        {'project_id': 'p1', 'dataset_id': 'sales', 'table_id': 'items', 'num_rows': 5, 'num_total_logical_bytes': gib,
+         'num_active_logical_bytes': gib, 'num_long_term_logical_bytes': 0, 'num_active_physical_bytes': gib,
+         'num_long_term_physical_bytes': gib, 'num_time_travel_physical_bytes': 0},
+        {'project_id': 'p1', 'dataset_id': 'hr', 'table_id': 'people', 'num_rows': 1, 'num_total_logical_bytes': 0,
+         'num_active_logical_bytes': 0, 'num_long_term_logical_bytes': 0, 'num_active_physical_bytes': 0,
+         'num_long_term_physical_bytes': 0, 'num_time_travel_physical_bytes': 0}])
+
+    df_storage_billing = bigquery_tables.aggregate_storage_billing(df_tables).set_index(['aggregation_level', 'dataset_id'], drop=False)
+
+    sales = df_storage_billing.loc[('DATASET', 'sales')]
+    assert (sales.num_tables, sales.num_rows, sales.num_total_logical_bytes) == (2, 15, 4 * gib)
+    assert sales.estimated_logical_cost == pytest.approx(3 * 0.02 + 1 * 0.01)
+    assert sales.estimated_physical_cost == pytest.approx(2 * 0.04 + 1 * 0.02)
+    assert sales.estimated_time_travel_cost == pytest.approx(0.04)
+    project = df_storage_billing[df_storage_billing.aggregation_level == 'PROJECT'].iloc[0]
+    assert (project.project_id, project.num_tables, project.num_rows) == ('p1', 3, 16)
+    assert pd.isnull(project.dataset_id)
+
+def test_aggregate_storage_billing_nulls_partial_totals():
+    df_tables = treated_tables([
+        {'project_id': 'p1', 'dataset_id': 'sales', 'table_id': 'orders', 'num_rows': 10, 'num_total_logical_bytes': 100},
+        {'project_id': 'p1', 'dataset_id': 'sales', 'table_id': 'unknown', 'size_stale': True},
+        {'project_id': 'p1', 'dataset_id': 'hr', 'table_id': 'people', 'num_rows': 1, 'num_total_logical_bytes': 100},
+        {'project_id': 'p2', 'dataset_id': 'logs', 'table_id': 'events', 'num_rows': 7, 'num_total_logical_bytes': 100}])
+
+    df_storage_billing = bigquery_tables.aggregate_storage_billing(df_tables, covered_projects={'p1'})
+
+    totals = {(row.aggregation_level, row.project_id, row.dataset_id): row.num_rows
+              for row in df_storage_billing.itertuples(index=False)}
+    #a table of unknown size nulls its dataset and project, a project not covered nulls all its totals
+    assert pd.isnull(totals[('DATASET', 'p1', 'sales')]) and pd.isnull(totals[('PROJECT', 'p1', None)])
+    assert totals[('DATASET', 'p1', 'hr')] == 1
+    assert pd.isnull(totals[('DATASET', 'p2', 'logs')]) and pd.isnull(totals[('PROJECT', 'p2', None)])
+    assert df_storage_billing.loc[df_storage_billing.dataset_id == 'sales', 'num_tables_size_stale'].tolist() == [1]
+    assert df_storage_billing.estimated_logical_cost.isna().sum() == 4
+
+def test_need_table_get(monkeypatch):
+    item = table_item('p', 'd', 't')
+    previous_tables_creation = {('p', 'd', 't'): 1760000000000, ('p', 'd', 'recreated'): 1750000000000}
+
+    assert bigquery_tables.need_table_get(item, 'ALWAYS')
+    assert not bigquery_tables.need_table_get(item, 'NEVER')
+    assert not bigquery_tables.need_table_get(item, 'CHANGED', previous_tables_creation)
+    assert bigquery_tables.need_table_get(table_item('p', 'd', 'recreated'), 'CHANGED', previous_tables_creation)
+    assert bigquery_tables.need_table_get(table_item('p', 'd', 'new'), 'CHANGED', previous_tables_creation)
+    monkeypatch.setattr(bigquery_tables.random, 'random', lambda: 0.05)
+    assert bigquery_tables.need_table_get(item, 'SAMPLE', sample_fraction=0.1)
+    assert not bigquery_tables.need_table_get(item, 'SAMPLE', sample_fraction=0.01)
+    with pytest.raises(ValueError):
+        bigquery_tables.need_table_get(item, 'SOMETIMES')
+
+def test_carry_previous_sizes():
+    df_tables = treated_tables([
+        {'project_id': 'p', 'dataset_id': 'd', 'table_id': 'fetched', 'num_rows': 1, 'num_bytes': 10},
+        {'project_id': 'p', 'dataset_id': 'd', 'table_id': 'same', 'size_stale': True},
+        {'project_id': 'p', 'dataset_id': 'd', 'table_id': 'recreated', 'size_stale': True},
+        {'project_id': 'p', 'dataset_id': 'd', 'table_id': 'new', 'size_stale': True}])
+    creation_time = int(pd.Timestamp('2025-10-09').timestamp() * 1000)
+    df_previous_tables = pd.DataFrame({'project_id': 'p', 'dataset_id': 'd', 'table_id': ['fetched', 'same', 'recreated'],
+                                       'creation_time': [creation_time, creation_time, creation_time - 1]})
+    for column in bigquery_tables.SIZE_COLUMNS:
+        df_previous_tables[column] = [5, 7, 9]
+
+    df_tables = bigquery_tables.carry_previous_sizes(df_tables, df_previous_tables).set_index('table_id')
+
+    #sizes are carried only to the stale tables, from the same table (same creation time)
+    assert df_tables.loc['fetched', 'num_rows'] == 1 and df_tables.loc['fetched', 'num_bytes'] == 10
+    assert (df_tables.loc['same', bigquery_tables.SIZE_COLUMNS] == 7).all()
+    assert df_tables.loc[['recreated', 'new'], bigquery_tables.SIZE_COLUMNS].isna().all().all()
+    assert df_tables.size_stale.tolist() == [False, True, True, True]
+    assert str(df_tables.num_rows.dtype) == 'Int64'
+
+def test_carry_previous_sizes_without_history():
+    df_tables = treated_tables([{'project_id': 'p', 'dataset_id': 'd', 'table_id': 'stale', 'size_stale': True}])
+    df_previous_tables = pd.DataFrame(columns=['project_id', 'dataset_id', 'table_id', 'creation_time'] + bigquery_tables.SIZE_COLUMNS)
+
+    df_tables = bigquery_tables.carry_previous_sizes(df_tables, df_previous_tables)
+
+    assert df_tables[bigquery_tables.SIZE_COLUMNS].isna().all().all()